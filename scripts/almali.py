@@ -22,13 +22,17 @@ Card selectors (div.product[data-id]):
 """
 
 import asyncio
-import csv
+import contextlib
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import aiohttp
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
+
+import common
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -37,7 +41,7 @@ from bs4 import BeautifulSoup
 BASE_URL     = "https://almali.az"
 CAT_PATH     = "/product-category/telefonlar"
 PJAX_PARAM   = "_pjax=.main-page-wrapper"
-CONCURRENCY  = 6
+CONCURRENCY  = 20
 
 OUTPUT_CSV = Path(__file__).parent.parent / "data" / "almali.csv"
 
@@ -76,68 +80,74 @@ FIELDNAMES = [
 # Helpers
 # ---------------------------------------------------------------------------
 
+_PRICE_RE = re.compile(r"[^\d.,]")
+_PAGE_RE  = re.compile(r"/page/(\d+)/")
+
+
 def page_url(page: int) -> str:
     if page == 1:
         return f"{BASE_URL}{CAT_PATH}/?{PJAX_PARAM}"
     return f"{BASE_URL}{CAT_PATH}/page/{page}/?{PJAX_PARAM}"
 
 
-def clean_price(tag) -> str:
-    """Extract numeric price from a bdi tag, stripping currency symbol."""
-    if tag is None:
+def clean_price(node) -> str:
+    """Extract numeric price from a bdi node, stripping currency symbol."""
+    if node is None:
         return ""
-    # Remove currency symbol span
-    for sym in tag.select("span.woocommerce-Price-currencySymbol"):
-        sym.decompose()
-    return re.sub(r"[^\d.,]", "", tag.get_text()).strip()
+    return _PRICE_RE.sub("", node.text()).strip()
 
 
-def parse_last_page(soup: BeautifulSoup) -> int:
-    pag = soup.select_one("nav.woocommerce-pagination")
+def parse_last_page(tree: LexborHTMLParser) -> int:
+    pag = tree.css_first("nav.woocommerce-pagination")
     if not pag:
         return 1
     nums: list[int] = []
-    for a in pag.select("a.page-numbers[href]"):
-        m = re.search(r"/page/(\d+)/", a.get("href", ""))
+    for a in pag.css("a.page-numbers[href]"):
+        m = _PAGE_RE.search(a.attributes.get("href") or "")
         if m:
             nums.append(int(m.group(1)))
-    for span in pag.select("span.page-numbers"):
-        t = span.get_text(strip=True)
+    for span in pag.css("span.page-numbers"):
+        t = span.text(strip=True)
         if t.isdigit():
             nums.append(int(t))
     return max(nums) if nums else 1
 
 
-def parse_cards(html: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+def parse_cards(html: bytes, need_last_page: bool = False) -> tuple[list[dict], int]:
+    """
+    Returns (products, last_page).
+    last_page is only computed for the discovery page; otherwise 0.
+    """
+    tree = LexborHTMLParser(html)
     products = []
 
-    for card in soup.select("div.product[data-id]"):
-        classes = card.get("class", [])
+    for card in tree.css("div.product[data-id]"):
+        attrs   = card.attributes
+        classes = (attrs.get("class") or "").split()
 
         # ── product ID ────────────────────────────────────────────────────
-        product_id = card.get("data-id", "")
+        product_id = attrs.get("data-id") or ""
 
         # ── name & url ────────────────────────────────────────────────────
-        title_a = card.select_one("h3.wd-entities-title a")
-        name = title_a.get_text(strip=True) if title_a else ""
-        url  = title_a.get("href", "") if title_a else ""
+        title_a = card.css_first("h3.wd-entities-title a")
+        name = title_a.text(strip=True) if title_a else ""
+        url  = (title_a.attributes.get("href") or "") if title_a else ""
 
         # fallback URL from image link
         if not url:
-            img_a = card.select_one("a.product-image-link[href]")
-            url = img_a.get("href", "") if img_a else ""
+            img_a = card.css_first("a.product-image-link[href]")
+            url = (img_a.attributes.get("href") or "") if img_a else ""
 
         # ── image ─────────────────────────────────────────────────────────
-        img = card.select_one("img.attachment-woocommerce_thumbnail")
-        image = img.get("src", "") if img else ""
+        img = card.css_first("img.attachment-woocommerce_thumbnail")
+        image = (img.attributes.get("src") or "") if img else ""
 
         # ── prices ────────────────────────────────────────────────────────
-        price_tag   = card.select_one("span.price")
-        del_bdi     = price_tag.select_one("del bdi")   if price_tag else None
-        ins_bdi     = price_tag.select_one("ins bdi")   if price_tag else None
+        price_tag   = card.css_first("span.price")
+        del_bdi     = price_tag.css_first("del bdi")   if price_tag else None
+        ins_bdi     = price_tag.css_first("ins bdi")   if price_tag else None
         # Single price (no sale)
-        only_bdi    = price_tag.select_one("bdi")       if price_tag else None
+        only_bdi    = price_tag.css_first("bdi")       if price_tag else None
 
         price_original = clean_price(del_bdi)
         price_current  = clean_price(ins_bdi)
@@ -153,12 +163,12 @@ def parse_cards(html: str) -> list[dict]:
         in_stock = "No" if "outofstock" in classes else "Yes"
 
         # ── product labels ────────────────────────────────────────────────
-        label_tags = card.select("span.product-label")
-        labels = " | ".join(l.get_text(strip=True) for l in label_tags if l.get_text(strip=True))
+        label_tags = card.css("span.product-label")
+        labels = " | ".join(l.text(strip=True) for l in label_tags if l.text(strip=True))
 
         # ── campaign / AWL label ──────────────────────────────────────────
-        campaign_tags = card.select("span.awl-inner-text")
-        campaign = " | ".join(c.get_text(strip=True) for c in campaign_tags if c.get_text(strip=True))
+        campaign_tags = card.css("span.awl-inner-text")
+        campaign = " | ".join(c.text(strip=True) for c in campaign_tags if c.text(strip=True))
 
         if name:
             products.append(
@@ -176,7 +186,8 @@ def parse_cards(html: str) -> list[dict]:
                 }
             )
 
-    return products, parse_last_page(BeautifulSoup(html, "html.parser"))
+    last_page = parse_last_page(tree) if need_last_page else 0
+    return products, last_page
 
 
 # ---------------------------------------------------------------------------
@@ -187,65 +198,98 @@ async def fetch_page(
     session: aiohttp.ClientSession,
     page: int,
     sem: asyncio.Semaphore,
+    pool: ProcessPoolExecutor,
 ) -> tuple[int, list[dict], int]:
     """Returns (page, products, last_page)."""
-    async with sem:
-        try:
-            async with session.get(
-                page_url(page), headers=HEADERS, ssl=True
-            ) as resp:
-                resp.raise_for_status()
-                html = await resp.text()
-                products, last_page = parse_cards(html)
-                print(f"  page {page:3d} → {len(products):3d} products", flush=True)
-                return page, products, last_page
-
-        except aiohttp.ClientResponseError as exc:
-            print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
-        except Exception as exc:
-            print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
+    try:
+        async with sem:
+            html = await common.fetch_bytes(session, page_url(page), HEADERS)
+
+        products, last_page = await common.parse(pool, parse_cards, html, page == 1)
+        print(f"  page {page:3d} → {len(products):3d} products", flush=True)
+        return page, products, last_page
+
+    except aiohttp.ClientResponseError as exc:
+        print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
+    except Exception as exc:
+        print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
 
     return page, [], 0
 
 
-async def scrape_all() -> list[dict]:
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
-    timeout   = aiohttp.ClientTimeout(total=60)
-    sem       = asyncio.Semaphore(CONCURRENCY)
+async def scrape_all(
+    out: asyncio.Queue,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> None:
+    """
+    Scrape every page, putting (page, products) on out as each one lands.
+    A runner can pass its own session and pool to share them with other
+    sites; otherwise both are created here.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if pool is None:
+            pool = common.enter_pool(stack, os.cpu_count() or 1)
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=CONCURRENCY,
+                limit_per_host=CONCURRENCY,
+                ttl_dns_cache=600,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+                ssl=True,
+            )
+            timeout = aiohttp.ClientTimeout(total=60)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector, timeout=timeout)
+            )
+        await _scrape(session, pool, out)
+
+
+async def _scrape(
+    session: aiohttp.ClientSession, pool: ProcessPoolExecutor, out: asyncio.Queue
+) -> None:
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    # ── Page 1: discover last page ────────────────────────────────────────
+    print("Fetching page 1 to determine total pages …")
+    _, first_products, last_page = await fetch_page(session, 1, sem, pool)
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # ── Page 1: discover last page ────────────────────────────────────
-        print("Fetching page 1 to determine total pages …")
-        _, first_products, last_page = await fetch_page(session, 1, sem)
+    last_page = max(1, last_page)
+    print(f"Total pages: {last_page}\n")
 
-        last_page = max(1, last_page)
-        print(f"Total pages: {last_page}\n")
+    await out.put((1, first_products))
 
-        all_products: list[dict] = list(first_products)
+    if last_page > 1:
+        # ── Pages 2..N: fixed pool of workers draining a queue ────────────
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for p in range(2, last_page + 1):
+            queue.put_nowait(p)
 
-        if last_page > 1:
-            tasks = [
-                fetch_page(session, p, sem)
-                for p in range(2, last_page + 1)
-            ]
-            results = await asyncio.gather(*tasks)
-            for _, products, _ in sorted(results, key=lambda r: r[0]):
-                all_products.extend(products)
+        async def worker() -> None:
+            while not queue.empty():
+                page = queue.get_nowait()
+                _, products, _ = await fetch_page(session, page, sem, pool)
+                out.put_nowait((page, products))
 
-    return all_products
+        await asyncio.gather(
+            *(worker() for _ in range(min(CONCURRENCY, last_page - 1)))
+        )
 
 
 # ---------------------------------------------------------------------------
-# CSV writer
+# Streaming CSV writer
 # ---------------------------------------------------------------------------
 
-def save_csv(products: list[dict], path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=FIELDNAMES, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(products)
-    print(f"\nSaved {len(products)} rows → {path}")
+async def scrape_to_csv(
+    path: Path,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> int:
+    """Scrape into path through the shared streaming writer (see common)."""
+    return await common.scrape_to_csv(
+        path, lambda out: scrape_all(out, session, pool), FIELDNAMES
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -254,23 +298,13 @@ def save_csv(products: list[dict], path: Path) -> None:
 
 def main() -> None:
     print(f"Scraping {BASE_URL}{CAT_PATH}/ …\n")
-    products = asyncio.run(scrape_all())
+    rows = asyncio.run(scrape_to_csv(OUTPUT_CSV))
 
-    if not products:
+    if not rows:
         print("No products scraped.", file=sys.stderr)
         sys.exit(1)
 
-    # Deduplicate by product_id (fallback: url)
-    seen: set[str] = set()
-    unique: list[dict] = []
-    for p in products:
-        key = p.get("product_id") or p.get("url") or p.get("name")
-        if key and key not in seen:
-            seen.add(key)
-            unique.append(p)
-
-    print(f"\nTotal unique products: {len(unique)}")
-    save_csv(unique, OUTPUT_CSV)
+    print(f"\nSaved {rows} unique rows → {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
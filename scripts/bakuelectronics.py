@@ -34,14 +34,17 @@ Product fields (JSON):
 """
 
 import asyncio
-import csv
+import contextlib
 import math
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import aiohttp
-from bs4 import BeautifulSoup
+import orjson
+
+import common
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -54,7 +57,7 @@ LANG     = "az"
 
 LISTING_URL = f"{BASE_URL}/{LANG}/catalog/{SLUG1}/{SLUG2}"
 
-CONCURRENCY = 6
+CONCURRENCY = 20
 
 OUTPUT_CSV = Path(__file__).parent.parent / "data" / "bakuelectronics.csv"
 
@@ -69,6 +72,20 @@ _BASE_HEADERS = {
     "sec-fetch-site": "same-origin",
 }
 
+_LISTING_HEADERS = {**_BASE_HEADERS,
+    "accept": "text/html,application/xhtml+xml,*/*;q=0.9",
+    "sec-fetch-dest": "document",
+    "sec-fetch-mode": "navigate",
+}
+
+_DATA_HEADERS = {**_BASE_HEADERS,
+    "accept": "*/*",
+    "x-nextjs-data": "1",
+    "referer": LISTING_URL,
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+}
+
 FIELDNAMES = [
     "product_id",
     "product_code",
@@ -91,6 +108,24 @@ FIELDNAMES = [
 # Helpers
 # ---------------------------------------------------------------------------
 
+_NEXT_DATA_RE = re.compile(
+    rb'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL
+)
+_BUILD_ID_RE  = re.compile(rb'"buildId"\s*:\s*"([^"]+)"')
+
+
+def next_data_blob(html: bytes) -> bytes:
+    """Slice the __NEXT_DATA__ JSON out with plain find()s; b"" if not found."""
+    i = html.find(b'id="__NEXT_DATA__"')
+    if i == -1:
+        return b""
+    j = html.find(b">", i) + 1
+    k = html.find(b"</script>", j)
+    if not j or k == -1:
+        return b""
+    return html[j:k]
+
+
 def api_url(build_id: str, page: int) -> str:
     return (
         f"{BASE_URL}/_next/data/{build_id}/{LANG}/catalog/{SLUG1}/{SLUG2}.json"
@@ -98,13 +133,8 @@ def api_url(build_id: str, page: int) -> str:
     )
 
 
-def product_url(slug: str) -> str:
-    if not slug:
-        return ""
-    return f"{BASE_URL}/{LANG}/product/{slug}"
-
-
 def parse_product(item: dict) -> dict:
+    slug           = item.get("slug")
     price_original = item.get("price", "")
     price_current  = item.get("discounted_price", "")
 
@@ -137,41 +167,43 @@ def parse_product(item: dict) -> dict:
         "rating":              item.get("rate", ""),
         "review_count":        item.get("reviewCount", ""),
         "online_only":         "Yes" if item.get("is_online") else "No",
-        "url":                 product_url(item.get("slug", "")),
+        "url":                 f"{BASE_URL}/{LANG}/product/{slug}" if slug else "",
         "image":               item.get("image", ""),
     }
 
 
+def parse_items(items: list[dict]) -> list[dict]:
+    """Parse one page of already-decoded items."""
+    return [parse_product(p) for p in items]
+
+
 # ---------------------------------------------------------------------------
 # Build-ID discovery
 # ---------------------------------------------------------------------------
 
 async def get_build_id(session: aiohttp.ClientSession) -> str:
     """Fetch the listing page and extract the Next.js buildId."""
-    headers = {**_BASE_HEADERS,
-        "accept": "text/html,application/xhtml+xml,*/*;q=0.9",
-        "sec-fetch-dest": "document",
-        "sec-fetch-mode": "navigate",
-    }
-    async with session.get(LISTING_URL, headers=headers, ssl=True) as resp:
-        resp.raise_for_status()
-        html = await resp.text()
-
-    # __NEXT_DATA__ JSON block
-    m = re.search(r'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', html, re.DOTALL)
-    if m:
-        import json as _json
-        nd = _json.loads(m.group(1))
-        build_id = nd.get("buildId", "")
+    html = await common.fetch_bytes(session, LISTING_URL, _LISTING_HEADERS)
+
+    # __NEXT_DATA__ JSON block (regex only if the fast slice comes up empty)
+    blob = next_data_blob(html)
+    if not blob and (m := _NEXT_DATA_RE.search(html)):
+        blob = m.group(1)
+    if blob:
+        try:
+            build_id = orjson.loads(blob).get("buildId", "")
+        except orjson.JSONDecodeError:
+            build_id = ""
         if build_id:
             print(f"  build_id: {build_id}")
             return build_id
 
     # Fallback: bare regex
-    m2 = re.search(r'"buildId"\s*:\s*"([^"]+)"', html)
+    m2 = _BUILD_ID_RE.search(html)
     if m2:
-        print(f"  build_id (fallback): {m2.group(1)}")
-        return m2.group(1)
+        build_id = m2.group(1).decode()
+        print(f"  build_id (fallback): {build_id}")
+        return build_id
 
     raise RuntimeError("Could not extract Next.js buildId from listing page")
 
@@ -189,30 +221,23 @@ async def fetch_page(
     """Returns (page, products, total)."""
     async with sem:
         try:
-            headers = {**_BASE_HEADERS,
-                "accept": "*/*",
-                "x-nextjs-data": "1",
-                "referer": LISTING_URL,
-                "sec-fetch-dest": "empty",
-                "sec-fetch-mode": "cors",
-            }
-            async with session.get(
-                api_url(build_id, page), headers=headers, ssl=True
-            ) as resp:
-                resp.raise_for_status()
-                data = await resp.json(content_type=None)
-
-                pdata    = data["pageProps"]["products"]["products"]
-                items    = pdata.get("items", [])
-                total    = pdata.get("total", 0)
-                products = [parse_product(p) for p in items]
-
-                print(
-                    f"  page {page:3d} → {len(products):3d} products"
-                    + (f"  (total: {total})" if page == 1 else ""),
-                    flush=True,
-                )
-                return page, products, total
+            data = orjson.loads(
+                await common.fetch_bytes(session, api_url(build_id, page), _DATA_HEADERS)
+            )
+
+            pdata    = data["pageProps"]["products"]["products"]
+            items    = pdata.get("items", [])
+            total    = pdata.get("total", 0)
+            # ~18 decoded items per page: pickling them to a worker would
+            # cost more than parsing them here
+            products = parse_items(items)
+
+            print(
+                f"  page {page:3d} → {len(products):3d} products"
+                + (f"  (total: {total})" if page == 1 else ""),
+                flush=True,
+            )
+            return page, products, total
 
         except aiohttp.ClientResponseError as exc:
             print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
@@ -222,51 +247,81 @@ async def fetch_page(
     return page, [], 0
 
 
-async def scrape_all() -> list[dict]:
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
-    timeout   = aiohttp.ClientTimeout(total=60)
-    sem       = asyncio.Semaphore(CONCURRENCY)
-
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # ── Discover build ID ─────────────────────────────────────────────
-        print("Fetching listing page to discover Next.js buildId …")
-        build_id = await get_build_id(session)
-
-        # ── Page 1: discover total ────────────────────────────────────────
-        print("\nFetching page 1 to determine total products …")
-        _, first_products, total = await fetch_page(session, build_id, 1, sem)
-
-        if not total:
-            return first_products
-
-        last_page = math.ceil(total / 18)
-        print(f"Total pages: {last_page}  ({total} products)\n")
-
-        all_products: list[dict] = list(first_products)
-
-        if last_page > 1:
-            tasks = [
-                fetch_page(session, build_id, p, sem)
-                for p in range(2, last_page + 1)
-            ]
-            results = await asyncio.gather(*tasks)
-            for _, products, _ in sorted(results, key=lambda r: r[0]):
-                all_products.extend(products)
-
-    return all_products
+async def scrape_all(
+    out: asyncio.Queue, session: aiohttp.ClientSession | None = None
+) -> None:
+    """
+    Scrape every page, putting (page, products) on out as each one lands.
+    A runner can pass its own session to share it with other sites;
+    otherwise one is created here.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=CONCURRENCY,
+                limit_per_host=CONCURRENCY,
+                ttl_dns_cache=600,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+                ssl=True,
+            )
+            timeout = aiohttp.ClientTimeout(total=60)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector, timeout=timeout)
+            )
+        await _scrape(session, out)
+
+
+async def _scrape(session: aiohttp.ClientSession, out: asyncio.Queue) -> None:
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    # ── Discover build ID ─────────────────────────────────────────────────
+    print("Fetching listing page to discover Next.js buildId …")
+    build_id = await get_build_id(session)
+
+    # ── Page 1: discover total ────────────────────────────────────────────
+    print("\nFetching page 1 to determine total products …")
+    _, first_products, total = await fetch_page(session, build_id, 1, sem)
+    await out.put((1, first_products))
+    if not total:
+        return
+
+    last_page = math.ceil(total / 18)
+    print(f"Total pages: {last_page}  ({total} products)\n")
+
+    if last_page > 1:
+        # ── Pages 2..N: fixed pool of workers draining a queue ────────────
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for p in range(2, last_page + 1):
+            queue.put_nowait(p)
+
+        async def worker() -> None:
+            while not queue.empty():
+                page = queue.get_nowait()
+                _, products, _ = await fetch_page(session, build_id, page, sem)
+                out.put_nowait((page, products))
+
+        await asyncio.gather(
+            *(worker() for _ in range(min(CONCURRENCY, last_page - 1)))
+        )
 
 
 # ---------------------------------------------------------------------------
-# CSV writer
+# Streaming CSV writer
 # ---------------------------------------------------------------------------
 
-def save_csv(products: list[dict], path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=FIELDNAMES, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(products)
-    print(f"\nSaved {len(products)} rows → {path}")
+async def scrape_to_csv(
+    path: Path,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> int:
+    """
+    Scrape into path through the shared streaming writer (see common).
+    pool is accepted for the runner's sake; JSON pages are parsed inline.
+    """
+    return await common.scrape_to_csv(
+        path, lambda out: scrape_all(out, session), FIELDNAMES
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -275,23 +330,13 @@ def save_csv(products: list[dict], path: Path) -> None:
 
 def main() -> None:
     print(f"Scraping {LISTING_URL} …\n")
-    products = asyncio.run(scrape_all())
+    rows = asyncio.run(scrape_to_csv(OUTPUT_CSV))
 
-    if not products:
+    if not rows:
         print("No products scraped.", file=sys.stderr)
         sys.exit(1)
 
-    # Deduplicate by product_id (fallback: url)
-    seen: set[str] = set()
-    unique: list[dict] = []
-    for p in products:
-        key = p.get("product_id") or p.get("url") or p.get("name")
-        if key and key not in seen:
-            seen.add(key)
-            unique.append(p)
-
-    print(f"\nTotal unique products: {len(unique)}")
-    save_csv(unique, OUTPUT_CSV)
+    print(f"\nSaved {rows} unique rows → {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
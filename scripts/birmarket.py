@@ -22,13 +22,17 @@ Fields:
 """
 
 import asyncio
-import csv
+import contextlib
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import aiohttp
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
+
+import common
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -36,7 +40,7 @@ from bs4 import BeautifulSoup
 
 BASE_URL    = "https://birmarket.az"
 CAT_PATH    = "/categories/3-mobil-telefonlar-ve-smartfonlar"
-CONCURRENCY = 6
+CONCURRENCY = 20
 
 OUTPUT_CSV = Path(__file__).parent.parent / "data" / "birmarket.csv"
 
@@ -71,6 +75,11 @@ FIELDNAMES = [
 # Helpers
 # ---------------------------------------------------------------------------
 
+_CURRENCY_RE = re.compile(r"[₼\s]")
+_DISCOUNT_RE = re.compile(r"[^\d\-]")
+_PAGE_RE     = re.compile(r"[?&]page=(\d+)")
+
+
 def page_url(page: int) -> str:
     return f"{BASE_URL}{CAT_PATH}?page={page}"
 
@@ -82,7 +91,7 @@ def clean_price(text: str) -> str:
     """
     t = text.strip()
     # Remove currency symbol and surrounding whitespace
-    t = re.sub(r"[₼\s]", "", t)
+    t = _CURRENCY_RE.sub("", t)
     # Remove thousands commas (e.g. 1,299.00 → 1299.00)
     t = t.replace(",", "")
     return t
@@ -90,76 +99,80 @@ def clean_price(text: str) -> str:
 
 def clean_discount(text: str) -> str:
     """'-39 %' → '-39'"""
-    return re.sub(r"[^\d\-]", "", text.strip())
+    return _DISCOUNT_RE.sub("", text.strip())
 
 
-def parse_last_page(soup: BeautifulSoup) -> int:
+def parse_last_page(tree: LexborHTMLParser) -> int:
     nums: list[int] = []
-    for a in soup.select("div.MPProductPaginationWrapper a[href]"):
-        m = re.search(r"[?&]page=(\d+)", a.get("href", ""))
+    for a in tree.css("div.MPProductPaginationWrapper a[href]"):
+        m = _PAGE_RE.search(a.attributes.get("href") or "")
         if m:
             nums.append(int(m.group(1)))
     # Also check span/button elements that may show page numbers
-    for el in soup.select("div.MPProductPaginationWrapper [class*='Page']"):
-        t = el.get_text(strip=True)
+    for el in tree.css("div.MPProductPaginationWrapper [class*='Page']"):
+        t = el.text(strip=True)
         if t.isdigit():
             nums.append(int(t))
     return max(nums) if nums else 1
 
 
-def parse_cards(html: str) -> tuple[list[dict], int]:
-    soup = BeautifulSoup(html, "html.parser")
+def parse_cards(html: bytes, need_last_page: bool = False) -> tuple[list[dict], int]:
+    """
+    Returns (products, last_page).
+    last_page is only computed for the discovery page; otherwise 0.
+    """
+    tree = LexborHTMLParser(html)
     products: list[dict] = []
 
-    for card in soup.select("div.MPProductItem[data-product-id]"):
+    for card in tree.css("div.MPProductItem[data-product-id]"):
         # ── product ID ────────────────────────────────────────────────────
-        product_id = card.get("data-product-id", "")
+        product_id = card.attributes.get("data-product-id") or ""
 
         # ── name ──────────────────────────────────────────────────────────
-        name_tag = card.select_one("span.MPTitle")
-        name = name_tag.get_text(strip=True) if name_tag else ""
+        name_tag = card.css_first("span.MPTitle")
+        name = name_tag.text(strip=True) if name_tag else ""
 
         # ── url ──────────────────────────────────────────────────────────
         url = ""
-        content_div = card.select_one(".MPProduct-Content")
+        content_div = card.css_first(".MPProduct-Content")
         if content_div:
-            a_tag = content_div.select_one("a[href]")
-            url = a_tag.get("href", "") if a_tag else ""
+            a_tag = content_div.css_first("a[href]")
+            url = (a_tag.attributes.get("href") or "") if a_tag else ""
         if not url:
-            a_tag = card.select_one("a[href]")
-            url = a_tag.get("href", "") if a_tag else ""
+            a_tag = card.css_first("a[href]")
+            url = (a_tag.attributes.get("href") or "") if a_tag else ""
         if url and not url.startswith("http"):
             url = BASE_URL + "/" + url.lstrip("/")
 
         # ── image ─────────────────────────────────────────────────────────
         image = ""
-        logo_div = card.select_one("div.MPProductItem-Logo")
+        logo_div = card.css_first("div.MPProductItem-Logo")
         if logo_div:
-            img = logo_div.select_one("img[src]")
-            image = img.get("src", "") if img else ""
+            img = logo_div.css_first("img[src]")
+            image = (img.attributes.get("src") or "") if img else ""
         if not image:
-            img = card.select_one("img[src]")
-            image = img.get("src", "") if img else ""
+            img = card.css_first("img[src]")
+            image = (img.attributes.get("src") or "") if img else ""
         if image and not image.startswith("http"):
             image = BASE_URL + "/" + image.lstrip("/")
 
         # ── prices ────────────────────────────────────────────────────────
-        price_new_tag = card.select_one('span[data-info="item-desc-price-new"]')
-        price_old_tag = card.select_one('span[data-info="item-desc-price-old"]')
+        price_new_tag = card.css_first('span[data-info="item-desc-price-new"]')
+        price_old_tag = card.css_first('span[data-info="item-desc-price-old"]')
 
-        price_current = clean_price(price_new_tag.get_text()) if price_new_tag else ""
-        price_old     = clean_price(price_old_tag.get_text()) if price_old_tag else ""
+        price_current = clean_price(price_new_tag.text()) if price_new_tag else ""
+        price_old     = clean_price(price_old_tag.text()) if price_old_tag else ""
 
         # ── discount % ────────────────────────────────────────────────────
-        disc_tag = card.select_one("div.MPProductItem-Discount")
-        discount_pct = clean_discount(disc_tag.get_text()) if disc_tag else ""
+        disc_tag = card.css_first("div.MPProductItem-Discount")
+        discount_pct = clean_discount(disc_tag.text()) if disc_tag else ""
 
         # ── installment ───────────────────────────────────────────────────
-        install_tag = card.select_one("div.MPInstallment span")
-        installment = install_tag.get_text(strip=True) if install_tag else ""
+        install_tag = card.css_first("div.MPInstallment span")
+        installment = install_tag.text(strip=True) if install_tag else ""
 
         # ── stock status ──────────────────────────────────────────────────
-        atc = card.select_one("button.AddToCart")
+        atc = card.css_first("button.AddToCart")
         in_stock = "Yes" if atc else "No"
 
         if name or product_id:
@@ -178,7 +191,8 @@ def parse_cards(html: str) -> tuple[list[dict], int]:
                 }
             )
 
-    return products, parse_last_page(soup)
+    last_page = parse_last_page(tree) if need_last_page else 0
+    return products, last_page
 
 
 # ---------------------------------------------------------------------------
@@ -189,65 +203,98 @@ async def fetch_page(
     session: aiohttp.ClientSession,
     page: int,
     sem: asyncio.Semaphore,
+    pool: ProcessPoolExecutor,
 ) -> tuple[int, list[dict], int]:
     """Returns (page, products, last_page)."""
-    async with sem:
-        try:
-            async with session.get(
-                page_url(page), headers=HEADERS, ssl=True
-            ) as resp:
-                resp.raise_for_status()
-                html = await resp.text()
-                products, last_page = parse_cards(html)
-                print(f"  page {page:3d} → {len(products):3d} products", flush=True)
-                return page, products, last_page
-
-        except aiohttp.ClientResponseError as exc:
-            print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
-        except Exception as exc:
-            print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
+    try:
+        async with sem:
+            html = await common.fetch_bytes(session, page_url(page), HEADERS)
+
+        products, last_page = await common.parse(pool, parse_cards, html, page == 1)
+        print(f"  page {page:3d} → {len(products):3d} products", flush=True)
+        return page, products, last_page
+
+    except aiohttp.ClientResponseError as exc:
+        print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
+    except Exception as exc:
+        print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
 
     return page, [], 0
 
 
-async def scrape_all() -> list[dict]:
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
-    timeout   = aiohttp.ClientTimeout(total=60)
-    sem       = asyncio.Semaphore(CONCURRENCY)
+async def scrape_all(
+    out: asyncio.Queue,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> None:
+    """
+    Scrape every page, putting (page, products) on out as each one lands.
+    A runner can pass its own session and pool to share them with other
+    sites; otherwise both are created here.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if pool is None:
+            pool = common.enter_pool(stack, os.cpu_count() or 1)
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=CONCURRENCY,
+                limit_per_host=CONCURRENCY,
+                ttl_dns_cache=600,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+                ssl=True,
+            )
+            timeout = aiohttp.ClientTimeout(total=60)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector, timeout=timeout)
+            )
+        await _scrape(session, pool, out)
+
+
+async def _scrape(
+    session: aiohttp.ClientSession, pool: ProcessPoolExecutor, out: asyncio.Queue
+) -> None:
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    # ── Page 1: discover last page ────────────────────────────────────────
+    print("Fetching page 1 to determine total pages …")
+    _, first_products, last_page = await fetch_page(session, 1, sem, pool)
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # ── Page 1: discover last page ────────────────────────────────────
-        print("Fetching page 1 to determine total pages …")
-        _, first_products, last_page = await fetch_page(session, 1, sem)
+    last_page = max(1, last_page)
+    print(f"Total pages: {last_page}\n")
 
-        last_page = max(1, last_page)
-        print(f"Total pages: {last_page}\n")
+    await out.put((1, first_products))
 
-        all_products: list[dict] = list(first_products)
+    if last_page > 1:
+        # ── Pages 2..N: fixed pool of workers draining a queue ────────────
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for p in range(2, last_page + 1):
+            queue.put_nowait(p)
 
-        if last_page > 1:
-            tasks = [
-                fetch_page(session, p, sem)
-                for p in range(2, last_page + 1)
-            ]
-            results = await asyncio.gather(*tasks)
-            for _, products, _ in sorted(results, key=lambda r: r[0]):
-                all_products.extend(products)
+        async def worker() -> None:
+            while not queue.empty():
+                page = queue.get_nowait()
+                _, products, _ = await fetch_page(session, page, sem, pool)
+                out.put_nowait((page, products))
 
-    return all_products
+        await asyncio.gather(
+            *(worker() for _ in range(min(CONCURRENCY, last_page - 1)))
+        )
 
 
 # ---------------------------------------------------------------------------
-# CSV writer
+# Streaming CSV writer
 # ---------------------------------------------------------------------------
 
-def save_csv(products: list[dict], path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=FIELDNAMES, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(products)
-    print(f"\nSaved {len(products)} rows → {path}")
+async def scrape_to_csv(
+    path: Path,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> int:
+    """Scrape into path through the shared streaming writer (see common)."""
+    return await common.scrape_to_csv(
+        path, lambda out: scrape_all(out, session, pool), FIELDNAMES
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -256,23 +303,13 @@ def save_csv(products: list[dict], path: Path) -> None:
 
 def main() -> None:
     print(f"Scraping {BASE_URL}{CAT_PATH} …\n")
-    products = asyncio.run(scrape_all())
+    rows = asyncio.run(scrape_to_csv(OUTPUT_CSV))
 
-    if not products:
+    if not rows:
         print("No products scraped.", file=sys.stderr)
         sys.exit(1)
 
-    # Deduplicate by product_id (fallback: url, then name)
-    seen: set[str] = set()
-    unique: list[dict] = []
-    for p in products:
-        key = p.get("product_id") or p.get("url") or p.get("name")
-        if key and key not in seen:
-            seen.add(key)
-            unique.append(p)
-
-    print(f"\nTotal unique products: {len(unique)}")
-    save_csv(unique, OUTPUT_CSV)
+    print(f"\nSaved {rows} unique rows → {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
@@ -21,13 +21,22 @@ Pagination:
 """
 
 import asyncio
-import csv
+import contextlib
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import aiohttp
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
+
+import common
+
+try:  # optional: faster event loop on Linux/macOS
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -35,7 +44,7 @@ from bs4 import BeautifulSoup
 
 BASE_URL = "https://bytelecom.az"
 LISTING_PATH = "/az/category/smartfonlar-1"
-CONCURRENCY = 5
+CONCURRENCY = 16
 
 OUTPUT_CSV = Path(__file__).parent.parent / "data" / "bytelecom.csv"
 
@@ -67,61 +76,68 @@ FIELDNAMES = [
 # Helpers
 # ---------------------------------------------------------------------------
 
+_PRICE_RE    = re.compile(r"[^\d.]")
+_PAGE_KEY_RE = re.compile(r"-page-(\d+)$")
+_WISHLIST_RE = re.compile(r"toggleWishlist\((\d+)\)")
+
+
 def clean_price(text: str) -> str:
     """'₼ 699.00' → '699.00'"""
-    return re.sub(r"[^\d.]", "", text).strip()
+    return _PRICE_RE.sub("", text).strip()
 
 
-def parse_last_page(soup: BeautifulSoup) -> int:
+def parse_last_page(tree: LexborHTMLParser) -> int:
     """
     Extract last page number from ul.pagination.
     Buttons have wire:key="paginator-page-1-page-N".
     """
-    pag = soup.select_one("ul.pagination")
+    pag = tree.css_first("ul.pagination")
     if not pag:
         return 1
     # All page-link items with a numeric label
     page_nums: list[int] = []
-    for item in pag.select("li.page-item"):
-        key = item.get("wire:key", "")
-        m = re.search(r"-page-(\d+)$", key)
+    for item in pag.css("li.page-item"):
+        key = item.attributes.get("wire:key") or ""
+        m = _PAGE_KEY_RE.search(key)
         if m:
             page_nums.append(int(m.group(1)))
         else:
             # fallback: text content of the button/span
-            txt = item.get_text(strip=True)
+            txt = item.text(strip=True)
             if txt.isdigit():
                 page_nums.append(int(txt))
     return max(page_nums) if page_nums else 1
 
 
-def parse_cards(html: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+def parse_cards(html: bytes, need_last_page: bool = False) -> tuple[list[dict], int]:
+    """
+    Returns (products, last_page).
+    last_page is only computed for the discovery page; otherwise 0.
+    """
+    tree = LexborHTMLParser(html)
     products = []
 
-    for card in soup.select("div.product"):
+    for card in tree.css("div.product"):
         # ── name & url ───────────────────────────────────────────────────
-        name_a = card.select_one("a.product-name")
-        name = name_a.get_text(strip=True) if name_a else ""
-        url = name_a.get("href", "") if name_a else ""
+        name_a = card.css_first("a.product-name")
+        name = name_a.text(strip=True) if name_a else ""
+        url = (name_a.attributes.get("href") or "") if name_a else ""
         # fallback url from first <a> pointing to /products/
         if not url:
-            for a in card.find_all("a", href=True):
-                if "/products/" in a["href"]:
-                    url = a["href"]
-                    break
+            link = card.css_first('a[href*="/products/"]')
+            url = (link.attributes.get("href") or "") if link else ""
 
         # ── image ────────────────────────────────────────────────────────
-        img_tag = card.select_one("div.product-img img")
-        image = img_tag.get("src", "") if img_tag else ""
+        img_tag = card.css_first("div.product-img img")
+        image = (img_tag.attributes.get("src") or "") if img_tag else ""
 
         # ── prices ───────────────────────────────────────────────────────
         # h6.discount-price = original (higher, struck-through)
         # h5.price          = current sale price
-        orig_tag = card.select_one("h6.discount-price")
-        curr_tag = card.select_one("h5.price")
-        price_original = clean_price(orig_tag.get_text()) if orig_tag else ""
-        price_current  = clean_price(curr_tag.get_text()) if curr_tag else ""
+        orig_tag = card.css_first("h6.discount-price")
+        curr_tag = card.css_first("h5.price")
+        price_original = clean_price(orig_tag.text()) if orig_tag else ""
+        price_current  = clean_price(curr_tag.text()) if curr_tag else ""
 
         # If only one price element exists
         if price_original and not price_current:
@@ -129,19 +145,19 @@ def parse_cards(html: str) -> list[dict]:
 
         # ── product ID from Livewire click handler ────────────────────────
         product_id = ""
-        wc = card.find(attrs={"wire:click": re.compile(r"toggleWishlist\(\d+\)")})
-        if wc:
-            m = re.search(r"toggleWishlist\((\d+)\)", wc.get("wire:click", ""))
+        for wc in card.css("[wire\\:click]"):
+            m = _WISHLIST_RE.search(wc.attributes.get("wire:click") or "")
             if m:
                 product_id = m.group(1)
+                break
 
         # ── badges ───────────────────────────────────────────────────────
-        badge_tags = card.select("div.badge-item p")
-        badges = " | ".join(b.get_text(strip=True) for b in badge_tags)
+        badge_tags = card.css("div.badge-item p")
+        badges = " | ".join(b.text(strip=True) for b in badge_tags)
 
         # ── specs ────────────────────────────────────────────────────────
-        spec_tags = card.select("div.product-info ul li")
-        specs = " | ".join(s.get_text(strip=True) for s in spec_tags)
+        spec_tags = card.css("div.product-info ul li")
+        specs = " | ".join(s.text(strip=True) for s in spec_tags)
 
         if name:
             products.append(
@@ -158,7 +174,7 @@ def parse_cards(html: str) -> list[dict]:
                 }
             )
 
-    return products
+    return products, (parse_last_page(tree) if need_last_page else 0)
 
 
 # ---------------------------------------------------------------------------
@@ -169,74 +185,113 @@ async def fetch_page(
     session: aiohttp.ClientSession,
     page: int,
     sem: asyncio.Semaphore,
+    pool: ProcessPoolExecutor,
 ) -> tuple[int, list[dict], int]:
     """Returns (page, products, last_page)."""
     url = BASE_URL + LISTING_PATH
     params = {"page": page}
 
-    async with sem:
-        try:
+    try:
+        async with sem:
             async with session.get(
                 url, params=params, headers=HEADERS, ssl=True
             ) as resp:
                 resp.raise_for_status()
-                html = await resp.text()
+                html = await resp.read()  # UTF-8 bytes; lexbor decodes them
 
-                soup = BeautifulSoup(html, "html.parser")
-                last_page = parse_last_page(soup) if page == 1 else 0
-                products = parse_cards(html)
+        products, last_page = await common.parse(pool, parse_cards, html, page == 1)
 
-                print(f"  page {page:3d} → {len(products):3d} products", flush=True)
-                return page, products, last_page
+        print(f"  page {page:3d} → {len(products):3d} products", flush=True)
+        return page, products, last_page
 
-        except aiohttp.ClientResponseError as exc:
-            print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
-        except Exception as exc:
-            print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
+    except aiohttp.ClientResponseError as exc:
+        print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
+    except Exception as exc:
+        print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
 
     return page, [], 0
 
 
-async def scrape_all() -> list[dict]:
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
-    timeout = aiohttp.ClientTimeout(total=60)
-    sem = asyncio.Semaphore(CONCURRENCY)
-
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # ── Page 1: discover total pages ──────────────────────────────────
-        print("Fetching page 1 to determine pagination …")
-        _, first_products, last_page = await fetch_page(session, 1, sem)
-
-        last_page = max(1, last_page)
-        print(f"Total pages: {last_page}\n")
+async def scrape_all(
+    out: asyncio.Queue,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> None:
+    """
+    Scrape every page, putting (page, products) on out as each one lands.
+    A runner can pass its own session and pool to share them with other
+    sites; otherwise both are created here.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if pool is None:
+            pool = common.enter_pool(stack, min(os.cpu_count() or 1, 4))
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=CONCURRENCY,
+                limit_per_host=CONCURRENCY,
+                ttl_dns_cache=600,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+                ssl=True,
+            )
+            timeout = aiohttp.ClientTimeout(total=60)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector, timeout=timeout)
+            )
+        await _scrape(session, pool, out)
 
-        all_products: list[dict] = list(first_products)
 
-        if last_page > 1:
-            tasks = [
-                fetch_page(session, p, sem)
-                for p in range(2, last_page + 1)
-            ]
-            results = await asyncio.gather(*tasks)
-            for _, products, _ in sorted(results, key=lambda r: r[0]):
-                all_products.extend(products)
+async def _scrape(
+    session: aiohttp.ClientSession, pool: ProcessPoolExecutor, out: asyncio.Queue
+) -> None:
+    # Bounds this site's requests even when the connector is shared
+    sem = asyncio.Semaphore(CONCURRENCY)
 
-    return all_products
+    # ── Page 1 plus a speculative first wave ──────────────────────────────
+    print("Fetching page 1 to determine pagination …")
+    # Pages 2..CONCURRENCY are requested alongside page 1 so the other
+    # slots aren't idle while pagination is discovered.
+    speculative = [
+        asyncio.create_task(fetch_page(session, p, sem, pool))
+        for p in range(2, CONCURRENCY + 1)
+    ]
+    _, first_products, last_page = await fetch_page(session, 1, sem, pool)
+
+    last_page = max(1, last_page)
+    print(f"Total pages: {last_page}\n")
+
+    out.put_nowait((1, first_products))
+
+    # Guessed pages past the end are cancelled and never read; awaiting them
+    # lets them unwind before the session or pool closes
+    cancelled = speculative[last_page - 1:]
+    for task in cancelled:
+        task.cancel()
+    await asyncio.gather(*cancelled, return_exceptions=True)
+
+    if last_page > 1:
+        tasks = speculative[:last_page - 1] + [
+            fetch_page(session, p, sem, pool)
+            for p in range(CONCURRENCY + 1, last_page + 1)
+        ]
+        for fut in asyncio.as_completed(tasks):
+            page, products, _ = await fut
+            out.put_nowait((page, products))
 
 
 # ---------------------------------------------------------------------------
-# CSV writer
+# Streaming CSV writer
 # ---------------------------------------------------------------------------
 
-def save_csv(products: list[dict], path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(
-            fh, fieldnames=FIELDNAMES, extrasaction="ignore"
-        )
-        writer.writeheader()
-        writer.writerows(products)
-    print(f"\nSaved {len(products)} rows → {path}")
+async def scrape_to_csv(
+    path: Path,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> int:
+    """Scrape into path through the shared streaming writer (see common)."""
+    return await common.scrape_to_csv(
+        path, lambda out: scrape_all(out, session, pool), FIELDNAMES
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -245,23 +300,14 @@ def save_csv(products: list[dict], path: Path) -> None:
 
 def main() -> None:
     print(f"Scraping {BASE_URL}{LISTING_PATH} …\n")
-    products = asyncio.run(scrape_all())
+    run = uvloop.run if uvloop else asyncio.run
+    rows = run(scrape_to_csv(OUTPUT_CSV))
 
-    if not products:
+    if not rows:
         print("No products scraped.", file=sys.stderr)
         sys.exit(1)
 
-    # Deduplicate by product_id (fallback: url)
-    seen: set[str] = set()
-    unique: list[dict] = []
-    for p in products:
-        key = p.get("product_id") or p.get("url") or p.get("name")
-        if key and key not in seen:
-            seen.add(key)
-            unique.append(p)
-
-    print(f"\nTotal unique products: {len(unique)}")
-    save_csv(unique, OUTPUT_CSV)
+    print(f"\nSaved {rows} unique rows → {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
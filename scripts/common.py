@@ -0,0 +1,175 @@
+"""
+Pieces shared by the async scrapers.
+
+fetch_bytes is a GET with retry and backoff, and parse hands a page to the
+process pool unless it is small. Each scraper's scrape_all(out) puts
+(page, products) items on a queue as pages land; scrape_to_csv here runs it
+alongside a single writer task that streams unique rows to disk.
+"""
+
+import asyncio
+import contextlib
+import csv
+import random
+from collections.abc import Awaitable, Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+
+MAX_RETRIES = 5
+POOL_MIN_SIZE = 8 * 1024  # smaller pages are parsed inline; pickling costs more
+
+_RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+_RETRY_ERRORS = (
+    aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError
+)
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+async def fetch_bytes(
+    session: aiohttp.ClientSession,
+    url: str,
+    headers: dict[str, str],
+    retries: int = MAX_RETRIES,
+) -> bytes:
+    """
+    GET url and return the body. 429/5xx responses and network errors are
+    retried with exponential backoff (honouring Retry-After); the final
+    attempt raises whatever it runs into.
+    """
+    for attempt in range(retries - 1):
+        retry_after = None
+        try:
+            async with session.get(url, headers=headers, ssl=True) as resp:
+                if resp.status not in _RETRY_STATUS:
+                    resp.raise_for_status()
+                    return await resp.read()
+                retry_after = resp.headers.get("Retry-After")
+        except _RETRY_ERRORS:
+            pass
+
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):  # absent, or an HTTP-date
+            delay = 2 ** attempt + random.random()
+        await asyncio.sleep(min(delay, 30))
+
+    async with session.get(url, headers=headers, ssl=True) as resp:
+        resp.raise_for_status()
+        return await resp.read()
+
+
+# ---------------------------------------------------------------------------
+# Process pool
+# ---------------------------------------------------------------------------
+
+def enter_pool(
+    stack: contextlib.AsyncExitStack, max_workers: int
+) -> ProcessPoolExecutor:
+    """
+    A ProcessPoolExecutor that stack shuts down in a thread, so waiting for
+    the workers to exit never blocks the event loop.
+    """
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+    stack.push_async_callback(asyncio.to_thread, pool.shutdown)
+    return pool
+
+
+async def parse(
+    pool: ProcessPoolExecutor, fn: Callable[..., Any], data: bytes | str, *args: Any
+) -> Any:
+    """
+    fn(data, *args), run in a worker process so the event loop keeps fetching.
+    Pages under POOL_MIN_SIZE are parsed inline instead.
+    """
+    if len(data) < POOL_MIN_SIZE:
+        return fn(data, *args)
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, data, *args)
+
+
+# ---------------------------------------------------------------------------
+# Streaming CSV writer
+# ---------------------------------------------------------------------------
+
+def product_key(p: dict) -> str:
+    """Default dedup key: product_id, then url, then name."""
+    return p.get("product_id") or p.get("url") or p.get("name")
+
+
+async def write_csv(
+    queue: asyncio.Queue,
+    path: Path,
+    fieldnames: list[str],
+    key: Callable[[Any], str] = product_key,
+    row: Callable[[Any], Sequence] | None = None,
+) -> int:
+    """
+    Drain (page, products) items until a None sentinel. Pages are written in
+    page order as soon as the next one is in, and duplicates are dropped on
+    the fly by key (first occurrence wins). Products are dicts projected onto
+    fieldnames unless row builds the CSV row itself.
+    Returns the number of rows written.
+    """
+    if row is None:
+        def row(p: dict) -> tuple:
+            return tuple(p.get(k, "") for k in fieldnames)
+
+    pending: dict[int, list] = {}
+    seen: set[str] = set()
+    next_page = 1
+    rows = 0
+
+    def flush(products: list) -> None:
+        nonlocal rows
+        for p in products:
+            k = key(p)
+            if k and k not in seen:
+                seen.add(k)
+                writer.writerow(row(p))
+                rows += 1
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8", buffering=1 << 20) as fh:
+        writer = csv.writer(fh)
+        writer.writerow(fieldnames)
+        while (item := await queue.get()) is not None:
+            pending[item[0]] = item[1]
+            while next_page in pending:
+                flush(pending.pop(next_page))
+                next_page += 1
+        for page in sorted(pending):
+            flush(pending[page])
+    return rows
+
+
+async def scrape_to_csv(
+    path: Path,
+    scrape: Callable[[asyncio.Queue], Awaitable[None]],
+    fieldnames: list[str],
+    key: Callable[[Any], str] = product_key,
+    row: Callable[[Any], Sequence] | None = None,
+) -> int:
+    """
+    Run scrape(queue) while a single writer streams unique rows to path.
+    Rows go to a temp file that only replaces path once the scrape finished
+    with data. Returns the number of rows written.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    tmp    = path.with_name(path.name + ".tmp")
+    writer = asyncio.create_task(write_csv(queue, tmp, fieldnames, key, row))
+    ok     = False
+    try:
+        await scrape(queue)
+        ok = True
+    finally:
+        queue.put_nowait(None)
+        rows = await writer
+        if ok and rows:
+            tmp.replace(path)
+        else:
+            tmp.unlink(missing_ok=True)
+    return rows
@@ -25,14 +25,25 @@ Card selectors:
 """
 
 import asyncio
-import csv
+import contextlib
 import math
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from urllib.parse import urlencode
 
 import aiohttp
-from bs4 import BeautifulSoup
+import orjson
+from selectolax.lexbor import LexborHTMLParser
+
+import common
+
+try:  # optional: faster event loop on Linux/macOS
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -45,7 +56,7 @@ CATEGORIES = [4, 3, 7, 8, 9, 10, 146, 163, 11, 144]
 PER_PAGE = 12
 SORT_BY = "default_sorting"
 LAYOUT = "grid"
-CONCURRENCY = 5
+CONCURRENCY = 16
 
 OUTPUT_CSV = Path(__file__).parent.parent / "data" / "digitalhome.csv"
 
@@ -83,85 +94,89 @@ FIELDNAMES = [
 # Helpers
 # ---------------------------------------------------------------------------
 
-def build_params(page: int) -> list[tuple]:
-    params = [
-        ("page", page),
-        ("per-page", PER_PAGE),
-        ("sort-by", SORT_BY),
-        ("layout", LAYOUT),
-    ]
-    for cat in CATEGORIES:
-        params.append(("categories[]", cat))
-    return params
+_PRICE_RE  = re.compile(r"[^\d,.]")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+# Everything after "page" is the same for every request, so it is encoded once
+_QUERY_TAIL = urlencode(
+    [("per-page", PER_PAGE), ("sort-by", SORT_BY), ("layout", LAYOUT)]
+    + [("categories[]", cat) for cat in CATEGORIES]
+)
+
+
+def page_url(page: int) -> str:
+    return f"{BASE_URL}{LISTING_PATH}?page={page}&{_QUERY_TAIL}"
 
 
 def clean_price(text: str) -> str:
     """Strip currency symbols, spaces → keep digits, comma, dot."""
-    return re.sub(r"[^\d,.]", "", text).strip()
+    return _PRICE_RE.sub("", text).strip()
 
 
 def parse_total(message: str) -> int:
     """'164 məhsul' → 164"""
-    m = re.search(r"\d+", message or "")
+    m = _DIGITS_RE.search(message or "")
     return int(m.group()) if m else 0
 
 
 def parse_cards(html: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+    tree = LexborHTMLParser(html)
     products = []
 
-    for card in soup.select("div.tpproduct"):
+    for card in tree.css("div.tpproduct"):
         # ── name & url ───────────────────────────────────────────────────
-        title_a = card.select_one("h3.tpproduct__title a")
+        title_a = card.css_first("h3.tpproduct__title a")
         name = ""
         url = ""
         if title_a:
-            name = title_a.get("title") or title_a.get_text(strip=True)
-            url = title_a.get("href", "")
+            name = title_a.attributes.get("title") or title_a.text(strip=True)
+            url = title_a.attributes.get("href") or ""
 
         # ── image ────────────────────────────────────────────────────────
-        thumb_a = card.select_one("div.tpproduct__thumb > a")
+        thumb_a = card.css_first("div.tpproduct__thumb > a")
         image = ""
         if thumb_a:
-            img = thumb_a.select_one("img:not(.product-thumb-secondary)")
+            img = thumb_a.css_first("img:not(.product-thumb-secondary)")
             if not img:
-                img = thumb_a.find("img")
+                img = thumb_a.css_first("img")
             if img:
-                image = img.get("src") or img.get("data-src", "")
+                image = img.attributes.get("src") or img.attributes.get("data-src") or ""
 
         # ── prices ───────────────────────────────────────────────────────
-        price_new_tag = card.select_one("span.price-new")
-        price_old_tag = card.select_one("span.price-old")
-        price_current = clean_price(price_new_tag.get_text()) if price_new_tag else ""
-        price_original = clean_price(price_old_tag.get_text()) if price_old_tag else ""
+        price_new_tag = card.css_first("span.price-new")
+        price_old_tag = card.css_first("span.price-old")
+        price_current = clean_price(price_new_tag.text()) if price_new_tag else ""
+        price_original = clean_price(price_old_tag.text()) if price_old_tag else ""
 
         # If no sale price, there may only be one price element
         if not price_current and not price_original:
-            any_price = card.select_one(".product-price-section span")
+            any_price = card.css_first(".product-price-section span")
             if any_price:
-                price_current = clean_price(any_price.get_text())
+                price_current = clean_price(any_price.text())
 
         # ── discount badge ───────────────────────────────────────────────
-        badge = card.select_one("span.product__badge-item")
-        discount = badge.get_text(strip=True) if badge else ""
+        badge = card.css_first("span.product__badge-item")
+        discount = badge.text(strip=True) if badge else ""
 
         # ── stock status ─────────────────────────────────────────────────
-        stock_tag = card.select_one("div.stock-status-badge span")
-        in_stock = stock_tag.get_text(strip=True) if stock_tag else ""
+        stock_tag = card.css_first("div.stock-status-badge span")
+        in_stock = stock_tag.text(strip=True) if stock_tag else ""
 
         # ── product id ───────────────────────────────────────────────────
-        cart_a = card.select_one("a.add-to-cart")
-        product_id = cart_a.get("data-id", "") if cart_a else ""
+        cart_a = card.css_first("a.add-to-cart")
+        product_id = (cart_a.attributes.get("data-id") or "") if cart_a else ""
 
         # ── installments ─────────────────────────────────────────────────
-        def get_installment(months: int) -> str:
-            opt = card.select_one(
-                f'div.installment-option[data-month="{months}"]'
+        # One pass over the options, bucketed by data-month (first one wins)
+        installments: dict[str, str] = {}
+        for opt in card.css("div.installment-option"):
+            attrs = opt.attributes
+            installments.setdefault(
+                attrs.get("data-month") or "", (attrs.get("data-amount") or "").strip()
             )
-            return opt.get("data-amount", "").strip() if opt else ""
-
-        install_6m = get_installment(6)
-        install_12m = get_installment(12)
+        install_6m = installments.get("6", "")
+        install_12m = installments.get("12", "")
 
         if name:
             products.append(
@@ -191,75 +206,111 @@ async def fetch_page(
     session: aiohttp.ClientSession,
     page: int,
     sem: asyncio.Semaphore,
+    pool: ProcessPoolExecutor,
 ) -> tuple[int, list[dict], int]:
     """Returns (page, products, total_items)."""
-    url = BASE_URL + LISTING_PATH
-    params = build_params(page)
-
-    async with sem:
-        try:
-            async with session.get(
-                url, params=params, headers=HEADERS, ssl=True
-            ) as resp:
+    try:
+        async with sem:
+            async with session.get(page_url(page), headers=HEADERS, ssl=True) as resp:
                 resp.raise_for_status()
-                data = await resp.json(content_type=None)
+                data = orjson.loads(await resp.read())
 
-                html_fragment = data.get("data", "")
-                message = data.get("message", "")
-                total_items = parse_total(message)
+        html_fragment = data.get("data", "")
+        message = data.get("message", "")
+        total_items = parse_total(message)
 
-                products = parse_cards(html_fragment)
-                print(f"  page {page:3d} → {len(products):3d} products", flush=True)
-                return page, products, total_items
+        products = await common.parse(pool, parse_cards, html_fragment)
+        print(f"  page {page:3d} → {len(products):3d} products", flush=True)
+        return page, products, total_items
 
-        except aiohttp.ClientResponseError as exc:
-            print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
-        except Exception as exc:
-            print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
+    except aiohttp.ClientResponseError as exc:
+        print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
+    except Exception as exc:
+        print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
 
     return page, [], 0
 
 
-async def scrape_all() -> list[dict]:
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
-    timeout = aiohttp.ClientTimeout(total=60)
+async def scrape_all(
+    out: asyncio.Queue,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> None:
+    """
+    Scrape every page, putting (page, products) on out as each one lands.
+    A runner can pass its own session and pool to share them with other
+    sites; otherwise both are created here.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if pool is None:
+            pool = common.enter_pool(stack, min(os.cpu_count() or 1, 4))
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=CONCURRENCY,
+                limit_per_host=CONCURRENCY,
+                ttl_dns_cache=600,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+                ssl=True,
+            )
+            timeout = aiohttp.ClientTimeout(total=60)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector, timeout=timeout)
+            )
+        await _scrape(session, pool, out)
+
+
+async def _scrape(
+    session: aiohttp.ClientSession, pool: ProcessPoolExecutor, out: asyncio.Queue
+) -> None:
+    # Bounds this site's requests even when the connector is shared
     sem = asyncio.Semaphore(CONCURRENCY)
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # ── Page 1: discover total ────────────────────────────────────────
-        print("Fetching page 1 to determine total …")
-        _, first_products, total_items = await fetch_page(session, 1, sem)
+    # ── Page 1 plus a speculative first wave ──────────────────────────────
+    print("Fetching page 1 to determine total …")
+    # Pages 2..CONCURRENCY are requested alongside page 1 so the other
+    # slots aren't idle while pagination is discovered.
+    speculative = [
+        asyncio.create_task(fetch_page(session, p, sem, pool))
+        for p in range(2, CONCURRENCY + 1)
+    ]
+    _, first_products, total_items = await fetch_page(session, 1, sem, pool)
 
-        total_pages = max(1, math.ceil(total_items / PER_PAGE))
-        print(f"Total items: {total_items}  |  Total pages: {total_pages}\n")
+    total_pages = max(1, math.ceil(total_items / PER_PAGE))
+    print(f"Total items: {total_items}  |  Total pages: {total_pages}\n")
 
-        all_products: list[dict] = list(first_products)
+    out.put_nowait((1, first_products))
 
-        if total_pages > 1:
-            tasks = [
-                fetch_page(session, p, sem)
-                for p in range(2, total_pages + 1)
-            ]
-            results = await asyncio.gather(*tasks)
-            for _, products, _ in sorted(results, key=lambda r: r[0]):
-                all_products.extend(products)
+    # Guessed pages past the end are cancelled and never read; awaiting them
+    # lets them unwind before the session or pool closes
+    cancelled = speculative[total_pages - 1:]
+    for task in cancelled:
+        task.cancel()
+    await asyncio.gather(*cancelled, return_exceptions=True)
 
-    return all_products
+    if total_pages > 1:
+        tasks = speculative[:total_pages - 1] + [
+            fetch_page(session, p, sem, pool)
+            for p in range(CONCURRENCY + 1, total_pages + 1)
+        ]
+        for fut in asyncio.as_completed(tasks):
+            page, products, _ = await fut
+            out.put_nowait((page, products))
 
 
 # ---------------------------------------------------------------------------
-# CSV writer
+# Streaming CSV writer
 # ---------------------------------------------------------------------------
 
-def save_csv(products: list[dict], path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(
-            fh, fieldnames=FIELDNAMES, extrasaction="ignore"
-        )
-        writer.writeheader()
-        writer.writerows(products)
-    print(f"\nSaved {len(products)} rows → {path}")
+async def scrape_to_csv(
+    path: Path,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> int:
+    """Scrape into path through the shared streaming writer (see common)."""
+    return await common.scrape_to_csv(
+        path, lambda out: scrape_all(out, session, pool), FIELDNAMES
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -268,23 +319,14 @@ def save_csv(products: list[dict], path: Path) -> None:
 
 def main() -> None:
     print(f"Scraping {BASE_URL}{LISTING_PATH} …\n")
-    products = asyncio.run(scrape_all())
+    run = uvloop.run if uvloop else asyncio.run
+    rows = run(scrape_to_csv(OUTPUT_CSV))
 
-    if not products:
+    if not rows:
         print("No products scraped.", file=sys.stderr)
         sys.exit(1)
 
-    # Deduplicate by product_id (fallback: url)
-    seen: set[str] = set()
-    unique: list[dict] = []
-    for p in products:
-        key = p.get("product_id") or p.get("url") or p.get("name")
-        if key and key not in seen:
-            seen.add(key)
-            unique.append(p)
-
-    print(f"\nTotal unique products: {len(unique)}")
-    save_csv(unique, OUTPUT_CSV)
+    print(f"\nSaved {rows} unique rows → {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
@@ -28,12 +28,17 @@ Product fields (JSON):
 """
 
 import asyncio
-import csv
+import contextlib
 import math
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
 from pathlib import Path
 
 import aiohttp
+import orjson
+
+import common
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -104,6 +109,10 @@ FIELDNAMES = [
 # Helpers
 # ---------------------------------------------------------------------------
 
+# Row positions of the dedup key fields
+_ID, _NAME, _URL = (FIELDNAMES.index(f) for f in ("product_id", "name", "url"))
+
+
 def api_url(page: int) -> str:
     return f"{API_URL}?CategoryId={CATEGORY_ID}&Limit={LIMIT}&Page={page}"
 
@@ -114,16 +123,31 @@ def product_url(route: str) -> str:
     return BASE_URL + "/" + route.lstrip("/")
 
 
-def parse_product(item: dict) -> dict:
-    price_current  = item.get("price", "")
-    price_original = item.get("previousPrice", "")
+# API keys read per product, pulled in one C-level call
+_API_KEYS = (
+    "id", "name", "brandName", "barCode", "price", "previousPrice",
+    "discountAmount", "discountPercent", "installmentMonthlyPayment",
+    "available", "storageQuantity", "labelText", "categoryName", "route",
+    "imageUrl",
+)
+_get_fields = itemgetter(*_API_KEYS)
+
+
+def parse_product(item: dict) -> tuple:
+    try:
+        fields = _get_fields(item)
+    except KeyError:  # a key is missing; treat it as "" like dict.get would
+        fields = tuple(item.get(k, "") for k in _API_KEYS)
+    (pid, name, brand, barcode, price_current, price_original, discount_amt,
+     discount_pct, installment, available, stock_qty, label, category, route,
+     image) = fields
 
     # previousPrice == price means no actual discount
     if price_original == price_current:
         price_original = ""
 
-    discount_amt = item.get("discountAmount") or ""
-    discount_pct = item.get("discountPercent") or ""
+    discount_amt = discount_amt or ""
+    discount_pct = discount_pct or ""
 
     # Compute from prices if API fields report 0 but prices differ
     if not discount_amt and price_original and price_current:
@@ -134,43 +158,70 @@ def parse_product(item: dict) -> dict:
         except (ValueError, TypeError):
             pass
 
-    return {
-        "product_id":          str(item.get("id", "")),
-        "name":                item.get("name", ""),
-        "brand":               item.get("brandName", ""),
-        "barcode":             item.get("barCode", ""),
-        "price_current":       price_current,
-        "price_original":      price_original,
-        "discount_amt":        discount_amt,
-        "discount_pct":        discount_pct,
-        "currency":            "AZN",
-        "installment_monthly": item.get("installmentMonthlyPayment", ""),
-        "available":           item.get("available", ""),
-        "stock_qty":           item.get("storageQuantity", ""),
-        "label":               item.get("labelText", "") or "",
-        "category":            item.get("categoryName", ""),
-        "url":                 product_url(item.get("route", "")),
-        "image":               item.get("imageUrl", ""),
-    }
+    # Same order as FIELDNAMES
+    return (
+        str(pid),
+        name,
+        brand,
+        barcode,
+        price_current,
+        price_original,
+        discount_amt,
+        discount_pct,
+        "AZN",
+        installment,
+        available,
+        stock_qty,
+        label or "",
+        category,
+        product_url(route),
+        image,
+    )
 
 
 # ---------------------------------------------------------------------------
 # Async fetching
 # ---------------------------------------------------------------------------
 
+class Admission:
+    """
+    Concurrency gate like asyncio.Semaphore, except the limit can be lowered
+    while requests are in flight (e.g. after an HTTP 429).
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit   = limit
+        self._active = 0
+        self._cond   = asyncio.Condition()
+
+    async def __aenter__(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+
+    async def __aexit__(self, *exc) -> None:
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def throttle(self) -> None:
+        """Drop the limit by one (never below 1); takes effect on next entry."""
+        self.limit = max(1, self.limit - 1)
+
+
 async def fetch_page(
     session: aiohttp.ClientSession,
     page: int,
-    sem: asyncio.Semaphore,
-) -> tuple[int, list[dict], int]:
+    admission: Admission,
+) -> tuple[int, list[tuple], int]:
     """Returns (page, products, total_count)."""
-    async with sem:
+    async with admission:
         try:
             async with session.get(
                 api_url(page), headers=HEADERS, ssl=True
             ) as resp:
                 resp.raise_for_status()
-                data = await resp.json(content_type=None)
+                data = orjson.loads(await resp.read())
 
                 total_count = data.get("productsCount", 0)
                 raw_products = data.get("products", [])
@@ -184,6 +235,8 @@ async def fetch_page(
                 return page, products, total_count
 
         except aiohttp.ClientResponseError as exc:
+            if exc.status == 429:
+                admission.throttle()
             print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
         except Exception as exc:
             print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
@@ -191,47 +244,77 @@ async def fetch_page(
     return page, [], 0
 
 
-async def scrape_all() -> list[dict]:
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
-    timeout   = aiohttp.ClientTimeout(total=60)
-    sem       = asyncio.Semaphore(CONCURRENCY)
-
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # ── Page 1: discover total count ──────────────────────────────────
-        print("Fetching page 1 to determine total products …")
-        _, first_products, total_count = await fetch_page(session, 1, sem)
-
-        if not total_count:
-            return first_products
-
-        last_page = math.ceil(total_count / LIMIT)
-        print(f"Total pages: {last_page}  ({total_count} products)\n")
-
-        all_products: list[dict] = list(first_products)
-
-        if last_page > 1:
-            tasks = [
-                fetch_page(session, p, sem)
-                for p in range(2, last_page + 1)
-            ]
-            results = await asyncio.gather(*tasks)
-            for _, products, _ in sorted(results, key=lambda r: r[0]):
-                all_products.extend(products)
-
-    return all_products
+async def scrape_all(
+    out: asyncio.Queue, session: aiohttp.ClientSession | None = None
+) -> None:
+    """
+    Scrape every page, putting (page, products) on out as each one lands.
+    A runner can pass its own session to share it with other sites;
+    otherwise one is created here.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=CONCURRENCY,
+                limit_per_host=CONCURRENCY,
+                ttl_dns_cache=600,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+                ssl=True,
+            )
+            timeout = aiohttp.ClientTimeout(total=60)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector, timeout=timeout)
+            )
+        await _scrape(session, out)
+
+
+async def _scrape(session: aiohttp.ClientSession, out: asyncio.Queue) -> None:
+    admission = Admission(CONCURRENCY)
+
+    # ── Page 1: discover total count ──────────────────────────────────────
+    print("Fetching page 1 to determine total products …")
+    _, first_products, total_count = await fetch_page(session, 1, admission)
+    out.put_nowait((1, first_products))
+
+    if not total_count:
+        return
+
+    last_page = math.ceil(total_count / LIMIT)
+    print(f"Total pages: {last_page}  ({total_count} products)\n")
+
+    if last_page > 1:
+        tasks = [
+            fetch_page(session, p, admission)
+            for p in range(2, last_page + 1)
+        ]
+        for fut in asyncio.as_completed(tasks):
+            page, products, _ = await fut
+            out.put_nowait((page, products))
 
 
 # ---------------------------------------------------------------------------
-# CSV writer
+# Streaming CSV writer
 # ---------------------------------------------------------------------------
 
-def save_csv(products: list[dict], path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=FIELDNAMES, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(products)
-    print(f"\nSaved {len(products)} rows → {path}")
+def row_key(p: tuple) -> str:
+    """Dedup key: product_id, then url, then name."""
+    return p[_ID] or p[_URL] or p[_NAME]
+
+
+async def scrape_to_csv(
+    path: Path,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> int:
+    """
+    Scrape into path through the shared streaming writer (see common).
+    Products are already FIELDNAMES-ordered tuples. pool is accepted for the
+    runner's sake; JSON pages are parsed inline.
+    """
+    return await common.scrape_to_csv(
+        path, lambda out: scrape_all(out, session), FIELDNAMES, row_key, row=tuple
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -240,23 +323,13 @@ def save_csv(products: list[dict], path: Path) -> None:
 
 def main() -> None:
     print(f"Scraping {API_URL} [CategoryId={CATEGORY_ID}] …\n")
-    products = asyncio.run(scrape_all())
+    rows = asyncio.run(scrape_to_csv(OUTPUT_CSV))
 
-    if not products:
+    if not rows:
         print("No products scraped.", file=sys.stderr)
         sys.exit(1)
 
-    # Deduplicate by product_id (fallback: url)
-    seen: set[str] = set()
-    unique: list[dict] = []
-    for p in products:
-        key = p.get("product_id") or p.get("url") or p.get("name")
-        if key and key not in seen:
-            seen.add(key)
-            unique.append(p)
-
-    print(f"\nTotal unique products: {len(unique)}")
-    save_csv(unique, OUTPUT_CSV)
+    print(f"\nSaved {rows} unique rows → {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
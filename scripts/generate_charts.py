@@ -5,14 +5,17 @@ Generates all business insight charts from data/data.csv → charts/
 
 import csv
 import collections
+import functools
+import os
 import re
-import statistics
 import pathlib
+from concurrent.futures import ProcessPoolExecutor
 
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
+from matplotlib import cbook
 import numpy as np
 
 # ---------------------------------------------------------------------------
@@ -26,7 +29,9 @@ CHARTS.mkdir(exist_ok=True)
 # ---------------------------------------------------------------------------
 # Style
 # ---------------------------------------------------------------------------
-plt.rcParams.update({
+# Applied per chart via render(), so importing this module leaves the
+# caller's rcParams alone
+STYLE = {
     "figure.facecolor":  "#FAFAFA",
     "axes.facecolor":    "#FFFFFF",
     "axes.spines.top":   False,
@@ -39,7 +44,9 @@ plt.rcParams.update({
     "axes.titlesize":    14,
     "axes.titleweight":  "bold",
     "axes.labelsize":    11,
-})
+    # Lay out while drawing, so savefig needs no extra bbox_inches pass
+    "figure.constrained_layout.use": True,
+}
 
 PALETTE = [
     "#2563EB","#16A34A","#DC2626","#D97706","#7C3AED",
@@ -64,11 +71,15 @@ RETAILER_LABELS = {
 # Data loading & preprocessing
 # ---------------------------------------------------------------------------
 
+_PRICE_RE = re.compile(r"[^\d.]")
+
+
+@functools.lru_cache(maxsize=1 << 16)  # the same price strings repeat a lot
 def to_float(s: str):
     if not s:
         return None
     try:
-        return float(re.sub(r"[^\d.]", "", s.replace(",", "")))
+        return float(_PRICE_RE.sub("", s.replace(",", "")))
     except ValueError:
         return None
 
@@ -87,6 +98,27 @@ BRAND_MERGE = {
     "poco":   "Xiaomi",
 }
 
+# All brands in one alternation; the leftmost brand in the name wins
+_BRAND_RE = re.compile(
+    r"\b("
+    + "|".join(map(re.escape, sorted(KNOWN_BRANDS, key=len, reverse=True)))
+    + r")\b"
+)
+
+
+def _leading_brand(name_lower: str):
+    """
+    Set lookup over the first few words, where the brand almost always is.
+    Returns None as soon as a word has punctuation (a \\b-bounded brand could
+    hide inside it), leaving the decision to _BRAND_RE.
+    """
+    for tok in name_lower.split(None, 4)[:4]:
+        if tok in KNOWN_BRANDS:
+            return tok
+        if not tok.isalnum():
+            return None
+    return None
+
 
 def extract_brand(name: str, brand_field: str) -> str:
     b = brand_field.strip().lower()
@@ -94,11 +126,11 @@ def extract_brand(name: str, brand_field: str) -> str:
         canonical = b.title()
         return BRAND_MERGE.get(b, canonical)
     name_lower = name.lower()
-    for br in KNOWN_BRANDS:
-        if re.search(r"\b" + re.escape(br) + r"\b", name_lower):
-            canonical = br.title()
-            return BRAND_MERGE.get(br, canonical)
-    return ""
+    br = _leading_brand(name_lower)
+    if not br:
+        m = _BRAND_RE.search(name_lower)
+        br = m.group(1) if m else ""
+    return BRAND_MERGE.get(br, br.title())
 
 
 def load_data():
@@ -112,17 +144,51 @@ def load_data():
     return rows
 
 
+def summarise(rows):
+    """
+    Single pass over rows → (rows per source, non-zero prices per source as
+    float arrays, priced listings per brand, prices per (brand, source)).
+    Built once in main() and shared by every chart that needs them.
+    """
+    by_src        = collections.defaultdict(list)
+    src_priced    = collections.Counter()
+    brand_ctr     = collections.Counter()
+    brand_src_ps  = collections.defaultdict(list)
+    for r in rows:
+        src = r["source"]
+        by_src[src].append(r)
+        if r["price_f"]:
+            src_priced[src] += 1
+            if b := r["brand_norm"]:
+                brand_ctr[b] += 1
+                brand_src_ps[b, src].append(r["price_f"])
+
+    # Counted above, so each array is allocated once at its final size
+    src_prices = {
+        s: np.fromiter((r["price_f"] for r in by_src[s] if r["price_f"]),
+                       dtype=np.float64, count=n)
+        for s, n in src_priced.items()
+    }
+    return dict(by_src), src_prices, brand_ctr, dict(brand_src_ps)
+
+
 # ---------------------------------------------------------------------------
 # Helper
 # ---------------------------------------------------------------------------
 
 def save(fig, name: str):
     path = CHARTS / name
-    fig.savefig(path, dpi=150, bbox_inches="tight")
+    fig.savefig(path, dpi=150)
     plt.close(fig)
     print(f"  Saved {name}")
 
 
+def render(chart, *args):
+    """Run one chart_* function under STYLE (in a worker process)."""
+    with matplotlib.rc_context(STYLE):
+        chart(*args)
+
+
 def rl(src: str) -> str:
     """Retailer label."""
     return RETAILER_LABELS.get(src, src)
@@ -132,8 +198,8 @@ def rl(src: str) -> str:
 # Chart 1 — Retailer Catalogue Size
 # ---------------------------------------------------------------------------
 
-def chart_catalogue_size(rows):
-    counter = collections.Counter(r["source"] for r in rows)
+def chart_catalogue_size(by_src):
+    counter = {s: len(src_rows) for s, src_rows in by_src.items()}
     sources = sorted(counter, key=lambda s: counter[s])
     counts  = [counter[s] for s in sources]
     labels  = [rl(s) for s in sources]
@@ -145,7 +211,6 @@ def chart_catalogue_size(rows):
     ax.set_xlabel("Number of Listings")
     ax.set_title("Retailer Catalogue Size — Total Listings per Platform")
     ax.set_xlim(0, max(counts) * 1.15)
-    fig.tight_layout()
     save(fig, "01_retailer_catalogue_size.png")
 
 
@@ -153,14 +218,9 @@ def chart_catalogue_size(rows):
 # Chart 2 — Median Price by Retailer
 # ---------------------------------------------------------------------------
 
-def chart_median_price(rows):
-    src_prices = collections.defaultdict(list)
-    for r in rows:
-        if r["price_f"]:
-            src_prices[r["source"]].append(r["price_f"])
-
-    sources = sorted(src_prices, key=lambda s: statistics.median(src_prices[s]))
-    medians = [statistics.median(src_prices[s]) for s in sources]
+def chart_median_price(src_medians):
+    sources = sorted(src_medians, key=src_medians.get)
+    medians = [src_medians[s] for s in sources]
     labels  = [rl(s) for s in sources]
     colors  = [PALETTE[i % len(PALETTE)] for i in range(len(sources))]
 
@@ -170,7 +230,6 @@ def chart_median_price(rows):
     ax.set_xlabel("Median Price (AZN)")
     ax.set_title("Price Positioning — Median Selling Price per Retailer")
     ax.set_xlim(0, max(medians) * 1.2)
-    fig.tight_layout()
     save(fig, "02_median_price_by_retailer.png")
 
 
@@ -186,24 +245,16 @@ SEGMENTS = [
     ("Ultra-Premium\n>2000 AZN",2000, 9e9),
 ]
 SEG_COLORS = ["#16A34A", "#2563EB", "#D97706", "#DC2626", "#7C3AED"]
+SEG_EDGES  = np.array([lo for _, lo, _ in SEGMENTS] + [SEGMENTS[-1][2]])
 
-def chart_price_segments(rows):
-    src_prices = collections.defaultdict(list)
-    for r in rows:
-        if r["price_f"]:
-            src_prices[r["source"]].append(r["price_f"])
-
-    sources = sorted(src_prices,
-                     key=lambda s: statistics.median(src_prices[s]))
+def chart_price_segments(src_prices, src_medians):
+    sources = sorted(src_medians, key=src_medians.get)
 
-    seg_counts = {}
-    for src in sources:
-        seg_counts[src] = []
-        ps = src_prices[src]
-        total = len(ps)
-        for _, lo, hi in SEGMENTS:
-            c = sum(1 for p in ps if lo <= p < hi)
-            seg_counts[src].append(c / total * 100 if total else 0)
+    # One histogram per retailer; rows = retailers, columns = segment shares (%)
+    seg_arr = np.vstack([
+        np.histogram(src_prices[s], bins=SEG_EDGES)[0] / len(src_prices[s]) * 100
+        for s in sources
+    ])
 
     labels = [rl(s) for s in sources]
     x      = np.arange(len(sources))
@@ -212,15 +263,15 @@ def chart_price_segments(rows):
     fig, ax = plt.subplots(figsize=(13, 6))
     bottoms = np.zeros(len(sources))
     for i, (seg_label, _, _) in enumerate(SEGMENTS):
-        vals = [seg_counts[s][i] for s in sources]
+        vals = seg_arr[:, i]
         ax.bar(x, vals, width, bottom=bottoms, color=SEG_COLORS[i],
                label=seg_label.replace("\n", " "))
-        for j, (v, b) in enumerate(zip(vals, bottoms)):
-            if v >= 8:
-                ax.text(j, b + v / 2, f"{v:.0f}%", ha="center",
-                        va="center", fontsize=8.5, color="white",
-                        fontweight="bold")
-        bottoms += np.array(vals)
+        for j in np.flatnonzero(vals >= 8):
+            v, b = vals[j], bottoms[j]
+            ax.text(j, b + v / 2, f"{v:.0f}%", ha="center",
+                    va="center", fontsize=8.5, color="white",
+                    fontweight="bold")
+        bottoms += vals
 
     ax.set_xticks(x)
     ax.set_xticklabels(labels, rotation=20, ha="right")
@@ -230,7 +281,6 @@ def chart_price_segments(rows):
               framealpha=0.9, edgecolor="#CCCCCC")
     ax.set_ylim(0, 110)
     ax.yaxis.set_major_formatter(mticker.PercentFormatter())
-    fig.tight_layout()
     save(fig, "03_price_segments_by_retailer.png")
 
 
@@ -238,10 +288,7 @@ def chart_price_segments(rows):
 # Chart 4 — Top Brands by Listing Count
 # ---------------------------------------------------------------------------
 
-def chart_top_brands(rows):
-    bc = collections.Counter(
-        r["brand_norm"] for r in rows if r["brand_norm"] and r["price_f"]
-    )
+def chart_top_brands(bc):
     # Remove generic/non-brand entries
     skip = {"Mobil", "Smartfon", "Telefon", "", "Corn"}
     top = [(b, c) for b, c in bc.most_common(30) if b not in skip][:12]
@@ -254,7 +301,6 @@ def chart_top_brands(rows):
     ax.set_xlabel("Number of Listings")
     ax.set_title("Brand Dominance — Top 12 Brands by Total Listings Across All Retailers")
     ax.set_xlim(0, max(counts) * 1.18)
-    fig.tight_layout()
     save(fig, "04_top_brands_listing_count.png")
 
 
@@ -262,20 +308,19 @@ def chart_top_brands(rows):
 # Chart 5 — Average Price by Brand (top brands, ≥30 listings)
 # ---------------------------------------------------------------------------
 
-def chart_brand_avg_price(rows):
+def chart_brand_avg_price(rows, bc):
     skip = {"Mobil", "Smartfon", "Telefon", "", "Corn"}
-    bc = collections.Counter(
-        r["brand_norm"] for r in rows if r["brand_norm"] and r["price_f"]
-    )
     eligible = [b for b, c in bc.most_common(30)
                 if c >= 30 and b not in skip][:10]
 
-    avg_prices = []
-    med_prices = []
-    for b in eligible:
-        ps = [r["price_f"] for r in rows if r["brand_norm"] == b and r["price_f"]]
-        avg_prices.append(statistics.mean(ps))
-        med_prices.append(statistics.median(ps))
+    # One pass to split prices by brand, instead of one scan per brand
+    brand_prices = collections.defaultdict(list)
+    for r in rows:
+        if r["brand_norm"] and r["price_f"]:
+            brand_prices[r["brand_norm"]].append(r["price_f"])
+
+    avg_prices = [np.mean(brand_prices[b])   for b in eligible]
+    med_prices = [np.median(brand_prices[b]) for b in eligible]
 
     order = sorted(range(len(eligible)), key=lambda i: med_prices[i])
     eligible   = [eligible[i] for i in order]
@@ -297,7 +342,6 @@ def chart_brand_avg_price(rows):
     ax.set_ylabel("Price (AZN)")
     ax.set_title("Brand Price Positioning — Average vs Median Selling Price (min 30 listings)")
     ax.legend(framealpha=0.9)
-    fig.tight_layout()
     save(fig, "05_brand_price_positioning.png")
 
 
@@ -318,22 +362,19 @@ def chart_discounts(rows):
             src_disc[src].append(pct)
             src_cover[src][0] += 1
 
-    sources_with_disc = [s for s in src_disc if src_disc[s]]
+    means = {s: np.mean(ds) for s, ds in src_disc.items() if ds}
     # Sort by avg discount depth descending so biggest discounters are on top
-    sources_with_disc.sort(key=lambda s: statistics.mean(src_disc[s]), reverse=True)
+    sources_with_disc = sorted(means, key=means.get, reverse=True)
 
-    avg_disc   = [statistics.mean(src_disc[s]) for s in sources_with_disc]
+    avg_disc   = [means[s] for s in sources_with_disc]
     cover_pcts = [src_cover[s][0] / src_cover[s][1] * 100
                   for s in sources_with_disc]
     labels = [rl(s) for s in sources_with_disc]
 
     # Two side-by-side horizontal bar charts — one scale each, fully readable
-    fig, (ax_left, ax_right) = plt.subplots(
-        1, 2, figsize=(14, 5),
-        gridspec_kw={"wspace": 0.45}
-    )
+    fig, (ax_left, ax_right) = plt.subplots(1, 2, figsize=(14, 5))
     fig.suptitle("Promotional Strategy — Discount Depth vs Coverage per Retailer",
-                 fontsize=14, fontweight="bold", y=1.01)
+                 fontsize=14, fontweight="bold")
 
     # ── Left: average discount depth ──────────────────────────────────────
     bars_l = ax_left.barh(labels, avg_disc, color="#DC2626", height=0.6, alpha=0.85)
@@ -355,12 +396,12 @@ def chart_discounts(rows):
     ax_right.xaxis.set_major_formatter(mticker.PercentFormatter())
     ax_right.invert_yaxis()
 
-    # Colour-key annotation
-    ax_right.text(108, len(labels) - 0.3, "Blue = 90%+\nAmber = 50–89%\nRed = <50%",
-                  fontsize=8, va="top", color="#555555",
+    # Colour-key annotation, pinned inside the top-right corner of the axes
+    ax_right.text(0.99, 0.98, "Blue = 90%+\nAmber = 50–89%\nRed = <50%",
+                  transform=ax_right.transAxes, ha="right", va="top",
+                  fontsize=8, color="#555555",
                   bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="#CCCCCC"))
 
-    fig.tight_layout()
     save(fig, "06_discount_aggressiveness.png")
 
 
@@ -368,15 +409,13 @@ def chart_discounts(rows):
 # Chart 7 — Samsung Price Across Retailers
 # ---------------------------------------------------------------------------
 
-def chart_samsung_prices(rows):
-    src_ps = collections.defaultdict(list)
-    for r in rows:
-        if r["brand_norm"] == "Samsung" and r["price_f"]:
-            src_ps[r["source"]].append(r["price_f"])
+def chart_samsung_prices(brand_src_ps):
+    src_ps = {s: ps for (b, s), ps in brand_src_ps.items() if b == "Samsung"}
 
-    sources = sorted(src_ps, key=lambda s: statistics.median(src_ps[s]))
-    meds    = [statistics.median(src_ps[s]) for s in sources]
-    avgs    = [statistics.mean(src_ps[s])   for s in sources]
+    med     = {s: np.median(ps) for s, ps in src_ps.items()}
+    sources = sorted(med, key=med.get)
+    meds    = [med[s] for s in sources]
+    avgs    = [np.mean(src_ps[s])           for s in sources]
     counts  = [len(src_ps[s])               for s in sources]
     labels  = [f"{rl(s)}  (n={counts[i]})" for i, s in enumerate(sources)]
 
@@ -401,7 +440,6 @@ def chart_samsung_prices(rows):
     ax.legend(framealpha=0.9, loc="lower right")
     ax.set_xlim(0, max(meds) * 1.35)
     ax.invert_yaxis()
-    fig.tight_layout()
     save(fig, "07_samsung_price_by_retailer.png")
 
 
@@ -409,16 +447,14 @@ def chart_samsung_prices(rows):
 # Chart 8 — Apple Price Across Retailers
 # ---------------------------------------------------------------------------
 
-def chart_apple_prices(rows):
-    src_ps = collections.defaultdict(list)
-    for r in rows:
-        if r["brand_norm"] == "Apple" and r["price_f"]:
-            src_ps[r["source"]].append(r["price_f"])
+def chart_apple_prices(brand_src_ps):
+    src_ps = {s: ps for (b, s), ps in brand_src_ps.items() if b == "Apple"}
 
     # Sort by median ascending
-    sources = sorted(src_ps, key=lambda s: statistics.median(src_ps[s]))
-    meds    = [statistics.median(src_ps[s]) for s in sources]
-    avgs    = [statistics.mean(src_ps[s])   for s in sources]
+    med     = {s: np.median(ps) for s, ps in src_ps.items()}
+    sources = sorted(med, key=med.get)
+    meds    = [med[s] for s in sources]
+    avgs    = [np.mean(src_ps[s])           for s in sources]
     counts  = [len(src_ps[s])               for s in sources]
     labels  = [f"{rl(s)}  (n={counts[i]})" for i, s in enumerate(sources)]
 
@@ -443,7 +479,6 @@ def chart_apple_prices(rows):
     ax.legend(framealpha=0.9, loc="upper left")
     ax.set_xlim(0, max(meds) * 1.45)
     ax.invert_yaxis()
-    fig.tight_layout()
     save(fig, "08_apple_price_by_retailer.png")
 
 
@@ -451,21 +486,28 @@ def chart_apple_prices(rows):
 # Chart 9 — Price Distribution (Box Plot)
 # ---------------------------------------------------------------------------
 
-def chart_price_distribution(rows):
-    src_prices = collections.defaultdict(list)
-    for r in rows:
-        if r["price_f"] and r["price_f"] < 6000:   # exclude extreme outliers
-            src_prices[r["source"]].append(r["price_f"])
+MAX_FLIERS = 500
+
+def chart_price_distribution(src_prices):
+    # exclude extreme outliers
+    src_prices = {s: kept for s, ps in src_prices.items()
+                  if (kept := ps[ps < 6000]).size}
 
     # Order by median
-    sources = sorted(src_prices,
-                     key=lambda s: statistics.median(src_prices[s]))
-    data    = [src_prices[s] for s in sources]
+    sources = sorted(src_prices, key=lambda s: np.median(src_prices[s]))
     labels  = [rl(s) for s in sources]
 
+    # Same quartiles/whiskers ax.boxplot would compute, but with at most
+    # MAX_FLIERS outlier dots per box so large catalogues stay cheap to draw
+    stats = cbook.boxplot_stats([src_prices[s] for s in sources])
+    rng   = np.random.default_rng(0)
+    for st in stats:
+        if len(st["fliers"]) > MAX_FLIERS:
+            st["fliers"] = rng.choice(st["fliers"], MAX_FLIERS, replace=False)
+
     fig, ax = plt.subplots(figsize=(13, 6))
-    bp = ax.boxplot(data, vert=True, patch_artist=True, notch=False,
-                    widths=0.55, medianprops=dict(color="black", linewidth=2))
+    bp = ax.bxp(stats, patch_artist=True, widths=0.55,
+                medianprops=dict(color="black", linewidth=2))
     for patch, color in zip(bp["boxes"], PALETTE):
         patch.set_facecolor(color)
         patch.set_alpha(0.75)
@@ -476,7 +518,6 @@ def chart_price_distribution(rows):
     ax.set_ylabel("Price (AZN)")
     ax.set_title("Price Distribution — Spread and Concentration of Prices per Retailer\n"
                  "(box = 25th–75th percentile, line = median, dots = outliers)")
-    fig.tight_layout()
     save(fig, "09_price_distribution_boxplot.png")
 
 
@@ -484,9 +525,7 @@ def chart_price_distribution(rows):
 # Chart 10 — Installment Plan Coverage
 # ---------------------------------------------------------------------------
 
-def chart_installments(rows):
-    src_total = collections.Counter(r["source"] for r in rows)
-
+def chart_installments(by_src):
     fields = [
         ("installment_6m",  "6-Month Plan",  "#16A34A"),
         ("installment_12m", "12-Month Plan", "#2563EB"),
@@ -495,9 +534,8 @@ def chart_installments(rows):
 
     # Collect coverage per source
     coverage = {}
-    for src in src_total:
-        src_rows = [r for r in rows if r["source"] == src]
-        total    = len(src_rows)
+    for src, src_rows in by_src.items():
+        total = len(src_rows)
         coverage[src] = [
             sum(1 for r in src_rows if r.get(f, "").strip()) / total * 100
             for f, _, _ in fields
@@ -525,7 +563,6 @@ def chart_installments(rows):
     ax.set_title("Installment Plan Coverage — % of Products Offering Credit Plans per Retailer")
     ax.legend(framealpha=0.9)
     ax.yaxis.set_major_formatter(mticker.PercentFormatter())
-    fig.tight_layout()
     save(fig, "10_installment_coverage.png")
 
 
@@ -533,16 +570,12 @@ def chart_installments(rows):
 # Chart 11 — Brand Share per Retailer (top 6 brands, stacked bar)
 # ---------------------------------------------------------------------------
 
-def chart_brand_mix_per_retailer(rows):
+def chart_brand_mix_per_retailer(by_src, src_prices, bc, brand_src_ps):
     skip = {"Mobil", "Smartfon", "Telefon", "", "Corn", "Itel"}
     # Global top-6 brands (excluding skips)
-    bc = collections.Counter(
-        r["brand_norm"] for r in rows
-        if r["brand_norm"] not in skip and r["price_f"]
-    )
-    top_brands = [b for b, _ in bc.most_common(6)]
+    top_brands = [b for b, _ in bc.most_common() if b not in skip][:6]
 
-    sources = sorted(set(r["source"] for r in rows))
+    sources = sorted(by_src)
 
     brand_colors = {
         "Samsung":  "#2563EB",
@@ -561,10 +594,8 @@ def chart_brand_mix_per_retailer(rows):
     for brand in top_brands:
         vals = []
         for src in sources:
-            src_rows = [r for r in rows if r["source"] == src and r["price_f"]]
-            total = len(src_rows) or 1
-            cnt   = sum(1 for r in src_rows if r["brand_norm"] == brand)
-            vals.append(cnt / total * 100)
+            total = len(src_prices.get(src, ())) or 1
+            vals.append(len(brand_src_ps.get((brand, src), ())) / total * 100)
         color = brand_colors.get(brand, "#888888")
         ax.bar(x, vals, 0.65, bottom=bottoms, label=brand, color=color, alpha=0.88)
         for j, (v, b) in enumerate(zip(vals, bottoms)):
@@ -588,7 +619,6 @@ def chart_brand_mix_per_retailer(rows):
               framealpha=0.9, edgecolor="#CCCCCC")
     ax.yaxis.set_major_formatter(mticker.PercentFormatter())
     ax.set_ylim(0, 115)
-    fig.tight_layout()
     save(fig, "11_brand_mix_per_retailer.png")
 
 
@@ -600,19 +630,29 @@ def main():
     print("Loading data …")
     rows = load_data()
     print(f"  {len(rows)} rows loaded\n")
+    by_src, src_prices, brand_ctr, brand_src_ps = summarise(rows)
+    src_medians = {s: np.median(ps) for s, ps in src_prices.items()}
+
+    jobs = [
+        (chart_catalogue_size,         by_src),
+        (chart_median_price,           src_medians),
+        (chart_price_segments,         src_prices, src_medians),
+        (chart_top_brands,             brand_ctr),
+        (chart_brand_avg_price,        rows, brand_ctr),
+        (chart_discounts,              rows),
+        (chart_samsung_prices,         brand_src_ps),
+        (chart_apple_prices,           brand_src_ps),
+        (chart_price_distribution,     src_prices),
+        (chart_installments,           by_src),
+        (chart_brand_mix_per_retailer, by_src, src_prices, brand_ctr, brand_src_ps),
+    ]
 
+    # Charts are independent CPU-bound Agg renders, one per worker process
     print("Generating charts …")
-    chart_catalogue_size(rows)
-    chart_median_price(rows)
-    chart_price_segments(rows)
-    chart_top_brands(rows)
-    chart_brand_avg_price(rows)
-    chart_discounts(rows)
-    chart_samsung_prices(rows)
-    chart_apple_prices(rows)
-    chart_price_distribution(rows)
-    chart_installments(rows)
-    chart_brand_mix_per_retailer(rows)
+    with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(render, *job) for job in jobs]
+        for fut in futures:
+            fut.result()
 
     print(f"\nAll charts saved to {CHARTS}/")
 
@@ -31,13 +31,18 @@ Fields:
 """
 
 import asyncio
-import csv
+import contextlib
+import itertools
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import aiohttp
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
+
+import common
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -63,6 +68,17 @@ _BASE_HEADERS = {
     "DNT": "1",
 }
 
+# list-products requests; the CSRF token is added once it is known
+_AJAX_HEADERS = {
+    **_BASE_HEADERS,
+    "accept": "*/*",
+    "X-Requested-With": "XMLHttpRequest",
+    "referer": LISTING_URL,
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-origin",
+}
+
 FIELDNAMES = [
     "product_id",
     "product_code",
@@ -83,75 +99,85 @@ FIELDNAMES = [
 # Helpers
 # ---------------------------------------------------------------------------
 
+_PRICE_RE     = re.compile(r"[^\d.,]")
+_CSRF_META_RE = re.compile(
+    r'<meta\s+name=["\']csrf-token["\'][^>]*content=["\']([^"\']+)["\']'
+)
+
+
 def clean_price(text: str) -> str:
     """'2229.99 AZN' → '2229.99'"""
-    return re.sub(r"[^\d.,]", "", text).strip()
+    return _PRICE_RE.sub("", text).strip()
 
 
-def parse_cards(html: str) -> tuple[list[dict], bool]:
+def parse_cards(html: bytes) -> tuple[list[dict], bool]:
     """Returns (products, has_more)."""
-    soup = BeautifulSoup(html, "html.parser")
+    tree = LexborHTMLParser(html)
 
     # ── Stop condition ────────────────────────────────────────────────────
-    load_more_btn = soup.select_one("#loadMore")
+    load_more_btn = tree.css_first("#loadMore")
     has_more = load_more_btn is not None
 
     products: list[dict] = []
 
-    for card in soup.select("div.product[class*='product-']"):
+    for card in tree.css("div.product[class*='product-']"):
         # ── Active variant: first tools div NOT hidden ────────────────────
-        tools = card.select_one("div.product__tools:not(.d-none)")
+        tools = card.css_first("div.product__tools:not(.d-none)")
         if not tools:
-            tools = card.select_one("div.product__tools")
+            tools = card.css_first("div.product__tools")
 
-        product_id   = tools.get("data-selected-id", "") if tools else ""
-        compare_a    = tools.select_one("a.to-compare[data-product-code]") if tools else None
-        product_code = compare_a.get("data-product-code", "") if compare_a else ""
+        product_id   = (tools.attributes.get("data-selected-id") or "") if tools else ""
+        compare_a    = tools.css_first("a.to-compare[data-product-code]") if tools else None
+        product_code = (compare_a.attributes.get("data-product-code") or "") if compare_a else ""
 
         # ── name (img alt) ────────────────────────────────────────────────
-        img_tag = card.select_one("img[src][alt]")
-        name    = img_tag.get("alt", "").strip() if img_tag else ""
-        image   = img_tag.get("src", "") if img_tag else ""
+        img_tag = card.css_first("img[src][alt]")
+        name    = (img_tag.attributes.get("alt") or "").strip() if img_tag else ""
+        image   = (img_tag.attributes.get("src") or "") if img_tag else ""
 
         # ── url ──────────────────────────────────────────────────────────
-        url_a = card.select_one("a[href*='/az/mehsullar/']")
-        url   = url_a.get("href", "") if url_a else ""
+        url_a = card.css_first("a[href*='/az/mehsullar/']")
+        url   = (url_a.attributes.get("href") or "") if url_a else ""
 
         # ── prices ────────────────────────────────────────────────────────
-        price_div = card.select_one("div.product__price__current")
-        old_tag   = price_div.select_one("span.old-price") if price_div else None
-        new_tag   = price_div.select_one("p.new-price")    if price_div else None
+        price_div = card.css_first("div.product__price__current")
+        old_tag   = price_div.css_first("span.old-price") if price_div else None
+        new_tag   = price_div.css_first("p.new-price")    if price_div else None
 
-        price_original = clean_price(old_tag.get_text()) if old_tag else ""
-        price_current  = clean_price(new_tag.get_text()) if new_tag else ""
+        price_original = clean_price(old_tag.text()) if old_tag else ""
+        price_current  = clean_price(new_tag.text()) if new_tag else ""
 
         # If no sale structure, fall back to any price element
         if not price_current and price_div:
-            price_current = clean_price(price_div.get_text())
+            price_current = clean_price(price_div.text())
 
         # ── discount badge ────────────────────────────────────────────────
-        disc_tag = card.select_one(
+        # Lexbor matches a selector group in document order, like bs4 did
+        disc_tag = card.css_first(
             "[class*='discount-badge'], [class*='label-discount'], "
             "[class*='sale-badge'], div.product__img [class*='discount']"
         )
-        discount_pct = disc_tag.get_text(strip=True) if disc_tag else ""
+        discount_pct = disc_tag.text(strip=True) if disc_tag else ""
 
         # ── installments ──────────────────────────────────────────────────
+        # Labels are indexed by their for attribute once (first one wins)
+        labels: dict[str, str] = {}
+        for lbl in card.css("label[for]"):
+            labels.setdefault(lbl.attributes.get("for") or "", lbl.text(strip=True))
+
         install_map: dict[str, str] = {}
-        for inp in card.select("input.ppl-input[data-monthly-payment]"):
-            inp_id = inp.get("id", "")
-            lbl = card.select_one(f"label[for='{inp_id}']")
-            if lbl:
-                months_text = lbl.get_text(strip=True)   # "6 ay", "12 ay", "18 ay"
-                monthly = inp.get("data-monthly-payment", "")
-                install_map[months_text] = monthly
+        for inp in card.css("input.ppl-input[data-monthly-payment]"):
+            attrs = inp.attributes
+            months_text = labels.get(attrs.get("id") or "")   # "6 ay", "12 ay", "18 ay"
+            if months_text is not None:
+                install_map[months_text] = attrs.get("data-monthly-payment") or ""
 
         installment_6m  = install_map.get("6 ay",  "")
         installment_12m = install_map.get("12 ay", "")
         installment_18m = install_map.get("18 ay", "")
 
         # ── stock ─────────────────────────────────────────────────────────
-        atc = card.select_one("a.product-add-to-cart.btn-green, button.product-add-to-cart.btn-green")
+        atc = card.css_first("a.product-add-to-cart.btn-green, button.product-add-to-cart.btn-green")
         in_stock = "Yes" if atc else "No"
 
         if name or product_id:
@@ -193,9 +219,7 @@ async def bootstrap(session: aiohttp.ClientSession) -> str:
         resp.raise_for_status()
         html = await resp.text()
 
-    m = re.search(
-        r'<meta\s+name=["\']csrf-token["\'][^>]*content=["\']([^"\']+)["\']', html
-    )
+    m = _CSRF_META_RE.search(html)
     if not m:
         raise RuntimeError("Could not find <meta name='csrf-token'> on listing page")
     csrf = m.group(1)
@@ -209,94 +233,124 @@ async def bootstrap(session: aiohttp.ClientSession) -> str:
 
 async def fetch_page(
     session: aiohttp.ClientSession,
-    csrf: str,
+    headers: dict[str, str],
     page: int,
     sem: asyncio.Semaphore,
+    pool: ProcessPoolExecutor,
 ) -> tuple[int, list[dict], bool]:
-    """Returns (page, products, has_more)."""
-    async with sem:
-        try:
-            headers = {
-                **_BASE_HEADERS,
-                "accept": "*/*",
-                "X-CSRF-TOKEN": csrf,
-                "X-Requested-With": "XMLHttpRequest",
-                "referer": LISTING_URL,
-                "sec-fetch-dest": "empty",
-                "sec-fetch-mode": "cors",
-                "sec-fetch-site": "same-origin",
-            }
+    """Returns (page, products, has_more), sending the CSRF-bearing headers."""
+    try:
+        async with sem:
             url = f"{AJAX_URL}?q=&sort=first_pinned&page={page}"
             async with session.get(url, headers=headers, ssl=True) as resp:
                 resp.raise_for_status()
-                html = await resp.text()
-                products, has_more = parse_cards(html)
-                print(
-                    f"  page {page:3d} → {len(products):2d} products"
-                    + ("  [end]" if not has_more else ""),
-                    flush=True,
-                )
-                return page, products, has_more
-
-        except aiohttp.ClientResponseError as exc:
-            print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
-        except Exception as exc:
-            print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
-
-    return page, [], True   # keep going on transient errors
-
+                html = await resp.read()  # UTF-8 bytes; lexbor decodes them
 
-async def scrape_all() -> list[dict]:
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
-    timeout   = aiohttp.ClientTimeout(total=60)
-    sem       = asyncio.Semaphore(CONCURRENCY)
-
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # ── Bootstrap: get CSRF token + session cookies ───────────────────
-        print("Bootstrapping session …")
-        csrf = await bootstrap(session)
-
-        # ── Page 1 sequentially (discover has_more) ───────────────────────
-        print("\nFetching page 1 …")
-        _, first_products, has_more = await fetch_page(session, csrf, 1, sem)
-
-        all_products: list[dict] = list(first_products)
-
-        if not has_more:
-            return all_products
+        products, has_more = await common.parse(pool, parse_cards, html)
+        print(
+            f"  page {page:3d} → {len(products):2d} products"
+            + ("  [end]" if not has_more else ""),
+            flush=True,
+        )
+        return page, products, has_more
 
-        # ── Batch-fetch remaining pages ───────────────────────────────────
-        page = 2
-        while page <= MAX_PAGE:
-            batch = list(range(page, page + CONCURRENCY))
-            tasks = [fetch_page(session, csrf, p, sem) for p in batch]
-            results = await asyncio.gather(*tasks)
+    except aiohttp.ClientResponseError as exc:
+        print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
+    except Exception as exc:
+        print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
 
-            done = False
-            for p, products, hm in sorted(results, key=lambda r: r[0]):
-                all_products.extend(products)
-                if not hm:
-                    done = True
-                    break   # discard pages fetched beyond end
+    return page, [], True   # keep going on transient errors
 
-            page += CONCURRENCY
-            if done:
-                break
 
-    return all_products
+async def scrape_all(
+    out: asyncio.Queue,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> None:
+    """
+    Scrape every page, putting (page, products) on out up to the last one.
+    A runner can pass its own session and pool to share them with other
+    sites; otherwise both are created here.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if pool is None:
+            pool = common.enter_pool(stack, min(os.cpu_count() or 1, 4))
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=CONCURRENCY,
+                limit_per_host=CONCURRENCY,
+                ttl_dns_cache=600,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+                ssl=True,
+            )
+            timeout = aiohttp.ClientTimeout(total=60)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector, timeout=timeout)
+            )
+        await _scrape(session, pool, out)
+
+
+async def _scrape(
+    session: aiohttp.ClientSession, pool: ProcessPoolExecutor, out: asyncio.Queue
+) -> None:
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    # ── Bootstrap: get CSRF token + session cookies ───────────────────────
+    print("Bootstrapping session …")
+    csrf    = await bootstrap(session)
+    headers = {**_AJAX_HEADERS, "X-CSRF-TOKEN": csrf}
+
+    # ── Page 1 sequentially (discover has_more) ───────────────────────────
+    print("\nFetching page 1 …")
+    _, first_products, has_more = await fetch_page(session, headers, 1, sem, pool)
+
+    out.put_nowait((1, first_products))
+
+    if not has_more:
+        return
+
+    # ── Remaining pages through CONCURRENCY workers ───────────────────────
+    # Each worker takes the next page as soon as it is free, so one
+    # slow page no longer holds up a whole batch. A page without a
+    # load-more button lowers end at once, so no worker starts a page
+    # past it. Finished pages are handed on in page order up to the
+    # first such page; anything fetched past it is dropped.
+    pages    = itertools.count(2)
+    finished: dict[int, tuple[list[dict], bool]] = {}
+    next_out = 2
+    end      = MAX_PAGE
+    stop     = False
+
+    async def worker() -> None:
+        nonlocal next_out, end, stop
+        while not stop and (p := next(pages)) <= end:
+            _, products, hm = await fetch_page(session, headers, p, sem, pool)
+            if not hm:
+                end = min(end, p)
+            finished[p] = (products, hm)
+            while not stop and next_out in finished:
+                products, hm = finished.pop(next_out)
+                out.put_nowait((next_out, products))
+                next_out += 1
+                stop = not hm
+
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
 
 
 # ---------------------------------------------------------------------------
-# CSV writer
+# Streaming CSV writer
 # ---------------------------------------------------------------------------
 
-def save_csv(products: list[dict], path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=FIELDNAMES, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(products)
-    print(f"\nSaved {len(products)} rows → {path}")
+async def scrape_to_csv(
+    path: Path,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> int:
+    """Scrape into path through the shared streaming writer (see common)."""
+    return await common.scrape_to_csv(
+        path, lambda out: scrape_all(out, session, pool), FIELDNAMES
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -305,23 +359,13 @@ def save_csv(products: list[dict], path: Path) -> None:
 
 def main() -> None:
     print(f"Scraping {LISTING_URL} …\n")
-    products = asyncio.run(scrape_all())
+    rows = asyncio.run(scrape_to_csv(OUTPUT_CSV))
 
-    if not products:
+    if not rows:
         print("No products scraped.", file=sys.stderr)
         sys.exit(1)
 
-    # Deduplicate by product_id (fallback: url, then name)
-    seen: set[str] = set()
-    unique: list[dict] = []
-    for p in products:
-        key = p.get("product_id") or p.get("url") or p.get("name")
-        if key and key not in seen:
-            seen.add(key)
-            unique.append(p)
-
-    print(f"\nTotal unique products: {len(unique)}")
-    save_csv(unique, OUTPUT_CSV)
+    print(f"\nSaved {rows} unique rows → {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
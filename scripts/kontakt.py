@@ -28,14 +28,18 @@ HTML fields:
 """
 
 import asyncio
-import csv
+import contextlib
 import json
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import aiohttp
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
+
+import common
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -81,6 +85,10 @@ FIELDNAMES = [
 # Helpers
 # ---------------------------------------------------------------------------
 
+_CURRENCY_RE = re.compile(r"[₼\s]")
+_PAGE_Q_RE   = re.compile(r"[?&]p=(\d+)")
+
+
 def page_url(page: int) -> str:
     return f"{CAT_URL}?p={page}"
 
@@ -94,7 +102,7 @@ def az_price(text: str) -> str:
     """
     t = text.strip()
     # Remove currency symbol and whitespace
-    t = re.sub(r"[₼\s]", "", t)
+    t = _CURRENCY_RE.sub("", t)
     # If comma present → decimal separator; dots are thousand separators
     if "," in t:
         t = t.replace(".", "").replace(",", ".")
@@ -103,76 +111,80 @@ def az_price(text: str) -> str:
     return t
 
 
-def parse_last_page(soup: BeautifulSoup) -> int:
+def parse_last_page(tree: LexborHTMLParser) -> int:
     # <a class="page last" href="...?p=14">
-    last_a = soup.select_one("a.page.last[href]")
+    last_a = tree.css_first("a.page.last[href]")
     if last_a:
-        m = re.search(r"[?&]p=(\d+)", last_a.get("href", ""))
+        m = _PAGE_Q_RE.search(last_a.attributes.get("href") or "")
         if m:
             return int(m.group(1))
     # Fallback: highest page number in pagination links
     nums = []
-    for a in soup.select("a.page[href]"):
-        m = re.search(r"[?&]p=(\d+)", a.get("href", ""))
+    for a in tree.css("a.page[href]"):
+        m = _PAGE_Q_RE.search(a.attributes.get("href") or "")
         if m:
             nums.append(int(m.group(1)))
     return max(nums) if nums else 1
 
 
-def parse_cards(html: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+def parse_cards(html: bytes, need_last_page: bool = False) -> tuple[list[dict], int]:
+    """
+    Returns (products, last_page).
+    last_page is only computed for the discovery page; otherwise 0.
+    """
+    tree = LexborHTMLParser(html)
     products = []
 
-    for card in soup.select("div.product-item[data-gtm]"):
+    for card in tree.css("div.product-item[data-gtm]"):
         # ── GTM JSON (fast lane) ─────────────────────────────────────────
         try:
-            gtm = json.loads(card.get("data-gtm", "{}"))
+            gtm = json.loads(card.attributes.get("data-gtm") or "{}")
         except json.JSONDecodeError:
             gtm = {}
 
         name         = gtm.get("item_name", "")
-        sku          = gtm.get("item_id", "") or card.get("data-sku", "")
+        sku          = gtm.get("item_id", "") or card.attributes.get("data-sku") or ""
         brand        = gtm.get("item_brand", "")
         gtm_price    = gtm.get("price", "")
         gtm_discount = gtm.get("discount", 0)
         category     = gtm.get("item_category", "")
 
         # ── product ID ────────────────────────────────────────────────────
-        product_id = card.get("id", "")
+        product_id = card.attributes.get("id") or ""
 
         # ── url ──────────────────────────────────────────────────────────
-        img_a = card.select_one("a.prodItem__img[href]")
-        url = img_a.get("href", "") if img_a else ""
+        img_a = card.css_first("a.prodItem__img[href]")
+        url = (img_a.attributes.get("href") or "") if img_a else ""
         if url and not url.startswith("http"):
             url = BASE_URL + "/" + url.lstrip("/")
 
         # ── image ─────────────────────────────────────────────────────────
         image = ""
-        src_tag = card.select_one("picture source[srcset]")
+        src_tag = card.css_first("picture source[srcset]")
         if src_tag:
             # srcset may contain multiple URLs; take first
-            image = src_tag.get("srcset", "").split(",")[0].split()[0]
+            image = (src_tag.attributes.get("srcset") or "").split(",")[0].split()[0]
         if not image:
-            img_tag = card.select_one("img.product-image[src]")
-            image = img_tag.get("src", "") if img_tag else ""
+            img_tag = card.css_first("img.product-image[src]")
+            image = (img_tag.attributes.get("src") or "") if img_tag else ""
 
         # ── prices from HTML ──────────────────────────────────────────────
-        prices_div = card.select_one("div.prodItem__prices")
+        prices_div = card.css_first("div.prodItem__prices")
         price_original = ""
         price_current  = ""
         installment    = ""
 
         if prices_div:
-            i_tag = prices_div.select_one("i")    # original (struck-through)
-            b_tag = prices_div.select_one("b")    # current sale price
-            s_tag = prices_div.select_one("span") # instalment info
+            i_tag = prices_div.css_first("i")    # original (struck-through)
+            b_tag = prices_div.css_first("b")    # current sale price
+            s_tag = prices_div.css_first("span") # instalment info
 
             if i_tag:
-                price_original = az_price(i_tag.get_text())
+                price_original = az_price(i_tag.text())
             if b_tag:
-                price_current = az_price(b_tag.get_text())
+                price_current = az_price(b_tag.text())
             if s_tag:
-                installment = s_tag.get_text(strip=True)
+                installment = s_tag.text(strip=True)
 
         # Fallback to GTM price if HTML price not found
         if not price_current and gtm_price:
@@ -184,8 +196,8 @@ def parse_cards(html: str) -> list[dict]:
 
         # ── stock status ──────────────────────────────────────────────────
         # If ANY non-out-stock swatch exists → in stock
-        all_swatches = card.select("a[class*='out-stock'], .out-stock")
-        non_out = card.select(
+        all_swatches = card.css("a[class*='out-stock'], .out-stock")
+        non_out = card.css(
             "a.swatch-option:not(.out-stock), div.swatch-option:not(.out-stock)"
         )
         if non_out:
@@ -194,7 +206,7 @@ def parse_cards(html: str) -> list[dict]:
             in_stock = "No"
         else:
             # No swatches — check for add-to-cart button
-            atc = card.select_one("[class*='addToCart'], button[title*='Səbətə']")
+            atc = card.css_first("[class*='addToCart'], button[title*='Səbətə']")
             in_stock = "Yes" if atc else "Unknown"
 
         if name or sku:
@@ -216,7 +228,7 @@ def parse_cards(html: str) -> list[dict]:
                 }
             )
 
-    return products, parse_last_page(soup)
+    return products, (parse_last_page(tree) if need_last_page else 0)
 
 
 # ---------------------------------------------------------------------------
@@ -227,65 +239,98 @@ async def fetch_page(
     session: aiohttp.ClientSession,
     page: int,
     sem: asyncio.Semaphore,
+    pool: ProcessPoolExecutor,
 ) -> tuple[int, list[dict], int]:
     """Returns (page, products, last_page)."""
-    async with sem:
-        try:
-            async with session.get(
-                page_url(page), headers=HEADERS, ssl=True
-            ) as resp:
+    try:
+        async with sem:
+            async with session.get(page_url(page), headers=HEADERS, ssl=True) as resp:
                 resp.raise_for_status()
-                html = await resp.text()
-                products, last_page = parse_cards(html)
-                print(f"  page {page:3d} → {len(products):3d} products", flush=True)
-                return page, products, last_page
+                html = await resp.read()  # UTF-8 bytes; lexbor decodes them
+
+        products, last_page = await common.parse(pool, parse_cards, html, page == 1)
+        print(f"  page {page:3d} → {len(products):3d} products", flush=True)
+        return page, products, last_page
 
-        except aiohttp.ClientResponseError as exc:
-            print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
-        except Exception as exc:
-            print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
+    except aiohttp.ClientResponseError as exc:
+        print(f"  page {page:3d} → HTTP {exc.status}", file=sys.stderr)
+    except Exception as exc:
+        print(f"  page {page:3d} → ERROR: {exc}", file=sys.stderr)
 
     return page, [], 0
 
 
-async def scrape_all() -> list[dict]:
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
-    timeout   = aiohttp.ClientTimeout(total=60)
-    sem       = asyncio.Semaphore(CONCURRENCY)
+async def scrape_all(
+    out: asyncio.Queue,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> None:
+    """
+    Scrape every page, putting (page, products) on out as each one lands.
+    A runner can pass its own session and pool to share them with other
+    sites; otherwise both are created here.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if pool is None:
+            pool = common.enter_pool(stack, min(os.cpu_count() or 1, 4))
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=CONCURRENCY,
+                limit_per_host=CONCURRENCY,
+                ttl_dns_cache=600,
+                keepalive_timeout=60,
+                enable_cleanup_closed=True,
+                ssl=True,
+            )
+            timeout = aiohttp.ClientTimeout(total=60)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector, timeout=timeout)
+            )
+        await _scrape(session, pool, out)
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # ── Page 1: discover last page ────────────────────────────────────
-        print("Fetching page 1 to determine total pages …")
-        _, first_products, last_page = await fetch_page(session, 1, sem)
 
-        last_page = max(1, last_page)
-        print(f"Total pages: {last_page}\n")
+async def _scrape(
+    session: aiohttp.ClientSession, pool: ProcessPoolExecutor, out: asyncio.Queue
+) -> None:
+    sem = asyncio.Semaphore(CONCURRENCY)
 
-        all_products: list[dict] = list(first_products)
+    # ── Page 1: discover last page ────────────────────────────────────────
+    print("Fetching page 1 to determine total pages …")
+    _, first_products, last_page = await fetch_page(session, 1, sem, pool)
 
-        if last_page > 1:
-            tasks = [
-                fetch_page(session, p, sem)
-                for p in range(2, last_page + 1)
-            ]
-            results = await asyncio.gather(*tasks)
-            for _, products, _ in sorted(results, key=lambda r: r[0]):
-                all_products.extend(products)
+    last_page = max(1, last_page)
+    print(f"Total pages: {last_page}\n")
 
-    return all_products
+    out.put_nowait((1, first_products))
+
+    if last_page > 1:
+        tasks = [
+            fetch_page(session, p, sem, pool)
+            for p in range(2, last_page + 1)
+        ]
+        for fut in asyncio.as_completed(tasks):
+            page, products, _ = await fut
+            out.put_nowait((page, products))
 
 
 # ---------------------------------------------------------------------------
-# CSV writer
+# Streaming CSV writer
 # ---------------------------------------------------------------------------
 
-def save_csv(products: list[dict], path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=FIELDNAMES, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(products)
-    print(f"\nSaved {len(products)} rows → {path}")
+def row_key(p: dict) -> str:
+    """Dedup key: product_id, then sku, then url."""
+    return p.get("product_id") or p.get("sku") or p.get("url")
+
+
+async def scrape_to_csv(
+    path: Path,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> int:
+    """Scrape into path through the shared streaming writer (see common)."""
+    return await common.scrape_to_csv(
+        path, lambda out: scrape_all(out, session, pool), FIELDNAMES, row_key
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -294,23 +339,13 @@ def save_csv(products: list[dict], path: Path) -> None:
 
 def main() -> None:
     print(f"Scraping {CAT_URL} …\n")
-    products = asyncio.run(scrape_all())
+    rows = asyncio.run(scrape_to_csv(OUTPUT_CSV))
 
-    if not products:
+    if not rows:
         print("No products scraped.", file=sys.stderr)
         sys.exit(1)
 
-    # Deduplicate by product_id / sku (fallback: url)
-    seen: set[str] = set()
-    unique: list[dict] = []
-    for p in products:
-        key = p.get("product_id") or p.get("sku") or p.get("url")
-        if key and key not in seen:
-            seen.add(key)
-            unique.append(p)
-
-    print(f"\nTotal unique products: {len(unique)}")
-    save_csv(unique, OUTPUT_CSV)
+    print(f"\nSaved {rows} unique rows → {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+"""
+Run several scrapers concurrently in one event loop.
+Output: data/<source>.csv for every site below
+
+All sites share a single aiohttp ClientSession (one connector, one DNS
+cache) and a single process pool for parsing. Each scraper still bounds its
+own concurrency and sends its own headers per request.
+
+Usage:
+  python3 scripts/runner.py                  # every site in SITES
+  python3 scripts/runner.py almali birmarket # a subset
+"""
+
+import asyncio
+import contextlib
+import os
+import sys
+
+import aiohttp
+
+import almali
+import bakuelectronics
+import birmarket
+import common
+import digitalhome
+import elitoptimal
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+SITES = {
+    "almali":          almali,
+    "bakuelectronics": bakuelectronics,
+    "birmarket":       birmarket,
+    "digitalhome":     digitalhome,
+    "elitoptimal":     elitoptimal,
+}
+
+
+# ---------------------------------------------------------------------------
+# Async runner
+# ---------------------------------------------------------------------------
+
+async def scrape_sites(names: list[str]) -> dict[str, int]:
+    """Scrape the named sites concurrently; returns rows written per site."""
+    modules   = [SITES[n] for n in names]
+    limit     = sum(m.CONCURRENCY for m in modules)
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=max(m.CONCURRENCY for m in modules),
+        ttl_dns_cache=600,
+        keepalive_timeout=60,
+        enable_cleanup_closed=True,
+        ssl=True,
+    )
+    timeout = aiohttp.ClientTimeout(total=60)
+
+    async with contextlib.AsyncExitStack() as stack:
+        pool    = common.enter_pool(stack, os.cpu_count() or 1)
+        session = await stack.enter_async_context(
+            aiohttp.ClientSession(connector=connector, timeout=timeout)
+        )
+        results = await asyncio.gather(
+            *(m.scrape_to_csv(m.OUTPUT_CSV, session, pool) for m in modules),
+            return_exceptions=True,
+        )
+
+    out: dict[str, int] = {}
+    for name, res in zip(names, results):
+        if isinstance(res, BaseException):
+            print(f"  {name} → ERROR: {res}", file=sys.stderr)
+            res = 0
+        out[name] = res
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def main() -> None:
+    names = sys.argv[1:] or list(SITES)
+    unknown = [n for n in names if n not in SITES]
+    if unknown:
+        print(f"Unknown site(s): {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(2)
+
+    print(f"Scraping {', '.join(names)} …\n")
+    results = asyncio.run(scrape_sites(names))
+
+    print()
+    for name, rows in results.items():
+        if rows:
+            print(f"{name}: saved {rows} unique rows → {SITES[name].OUTPUT_CSV}")
+        else:
+            print(f"{name}: no products scraped.", file=sys.stderr)
+
+    if not all(results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -25,13 +25,17 @@ Card selectors (div.item > div.productCard):
 """
 
 import asyncio
-import csv
+import contextlib
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import aiohttp
-from bs4 import BeautifulSoup
+import orjson
+from selectolax.lexbor import LexborHTMLParser
+
+import common
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -57,6 +61,16 @@ _BASE_HEADERS = {
     "DNT": "1",
 }
 
+# load-more POSTs; the CSRF token is added once it is known
+_POST_HEADERS = {
+    **_BASE_HEADERS,
+    "Accept": "application/json, text/javascript, */*; q=0.01",
+    "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+    "Origin": BASE_URL,
+    "Referer": LISTING_URL,
+    "X-Requested-With": "XMLHttpRequest",
+}
+
 FIELDNAMES = [
     "product_id",
     "name",
@@ -75,74 +89,83 @@ FIELDNAMES = [
 # Helpers
 # ---------------------------------------------------------------------------
 
-def extract_csrf(html: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
-    tag = soup.find("meta", {"name": "csrf-token"})
-    return tag.get("content", "") if tag else ""
+_PRICE_RE     = re.compile(r"[^\d.]")
+_CSRF_META_RE = re.compile(
+    rb"""<meta[^>]+name=["']csrf-token["'][^>]+content=["']([^"']+)"""
+)
+
+
+def extract_csrf(html: bytes) -> str:
+    """Regex fast path for <meta name="csrf-token">; parses only as a fallback."""
+    m = _CSRF_META_RE.search(html)
+    if m:
+        return m.group(1).decode()
+    tag = LexborHTMLParser(html).css_first('meta[name="csrf-token"]')
+    return (tag.attributes.get("content") or "") if tag else ""
 
 
 def clean_price(text: str) -> str:
     """'1549\n.00\n₼' → '1549.00'"""
-    return re.sub(r"[^\d.]", "", text).strip()
+    return _PRICE_RE.sub("", text).strip()
 
 
-def parse_cards(html: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+def parse_cards(html: str | bytes) -> list[dict]:
+    tree = LexborHTMLParser(html)
     products = []
 
-    for item in soup.select("div.item"):
-        card = item.select_one("div.productCard") or item
+    for item in tree.css("div.item"):
+        card = item.css_first("div.productCard") or item
 
         # ── product ID ────────────────────────────────────────────────────
-        fav_btn = card.select_one("button.add-favorite[data-id]")
-        product_id = fav_btn.get("data-id", "") if fav_btn else ""
+        fav_btn = card.css_first("button.add-favorite[data-id]")
+        product_id = (fav_btn.attributes.get("data-id") or "") if fav_btn else ""
 
         # fallback: cart button
         if not product_id:
-            cart_btn = card.select_one("button.addToCart[data-id]")
-            product_id = cart_btn.get("data-id", "") if cart_btn else ""
+            cart_btn = card.css_first("button.addToCart[data-id]")
+            product_id = (cart_btn.attributes.get("data-id") or "") if cart_btn else ""
 
         # ── name ─────────────────────────────────────────────────────────
-        name_div = card.select_one("div.productName")
-        name = name_div.get_text(strip=True) if name_div else ""
+        name_div = card.css_first("div.productName")
+        name = name_div.text(strip=True) if name_div else ""
 
         # ── url ──────────────────────────────────────────────────────────
-        url_a = card.select_one("a.productUrl[href]")
-        url = url_a.get("href", "") if url_a else ""
+        url_a = card.css_first("a.productUrl[href]")
+        url = (url_a.attributes.get("href") or "") if url_a else ""
         if url and not url.startswith("http"):
             url = BASE_URL + "/" + url.lstrip("/")
 
         # ── image ────────────────────────────────────────────────────────
-        img = card.select_one("img.productImage-img")
-        image = img.get("src", "") if img else ""
+        img = card.css_first("img.productImage-img")
+        image = (img.attributes.get("src") or "") if img else ""
         if image and not image.startswith("http"):
             image = BASE_URL + "/" + image.lstrip("/")
 
         # ── price ─────────────────────────────────────────────────────────
-        real_price = card.select_one("span.realPrice")
+        real_price = card.css_first("span.realPrice")
         if real_price:
             # remove <sup> tag content first
-            for sup in real_price.select("sup"):
+            for sup in real_price.css("sup"):
                 sup.decompose()
-            price_current = clean_price(real_price.get_text())
+            price_current = clean_price(real_price.text())
         else:
             price_current = ""
 
         # ── installments ─────────────────────────────────────────────────
         def get_install(months: int) -> str:
-            lbl = card.select_one(f'label[for$="-{months}"][data-price]')
-            return lbl.get("data-price", "") if lbl else ""
+            lbl = card.css_first(f'label[for$="-{months}"][data-price]')
+            return (lbl.attributes.get("data-price") or "") if lbl else ""
 
         install_6  = get_install(6)
         install_12 = get_install(12)
         install_18 = get_install(18)
 
         # ── labels / badges ───────────────────────────────────────────────
-        label_tags = card.select("div.labels p")
-        labels = " | ".join(l.get_text(strip=True) for l in label_tags if l.get_text(strip=True))
+        label_tags = card.css("div.labels p")
+        labels = " | ".join(t for l in label_tags if (t := l.text(strip=True)))
 
         # ── color variants ────────────────────────────────────────────────
-        colors = card.select("span.color_item[data-color]")
+        colors = card.css("span.color_item[data-color]")
         color_count = len(colors)
 
         if name:
@@ -173,7 +196,7 @@ async def bootstrap(session: aiohttp.ClientSession) -> tuple[list[dict], str]:
     """GET the listing page → (first_products, csrf_token)."""
     async with session.get(LISTING_URL, headers=_BASE_HEADERS, ssl=True) as r:
         r.raise_for_status()
-        html = await r.text()
+        html = await r.read()  # UTF-8 bytes; lexbor decodes them
     csrf = extract_csrf(html)
     products = parse_cards(html)
     print(f"  page   1 → {len(products):3d} products  (CSRF: {csrf[:16]}…)")
@@ -183,34 +206,24 @@ async def bootstrap(session: aiohttp.ClientSession) -> tuple[list[dict], str]:
 async def fetch_page(
     session: aiohttp.ClientSession,
     page: int,
-    csrf: str,
+    headers: dict[str, str],
     sem: asyncio.Semaphore,
 ) -> tuple[int, list[dict], bool]:
     """
-    POST load-more page N.
+    POST load-more page N with the CSRF-bearing headers.
     Returns (page, products, has_more).
     has_more=False when html is empty.
     """
-    post_headers = {
-        **_BASE_HEADERS,
-        "Accept": "application/json, text/javascript, */*; q=0.01",
-        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-        "Origin": BASE_URL,
-        "Referer": LISTING_URL,
-        "X-Requested-With": "XMLHttpRequest",
-        "X-CSRF-TOKEN": csrf,
-    }
-
     async with sem:
         try:
             async with session.post(
                 LOAD_MORE_URL,
                 data={"page": str(page)},
-                headers=post_headers,
+                headers=headers,
                 ssl=True,
             ) as resp:
                 resp.raise_for_status()
-                j = await resp.json(content_type=None)
+                j = orjson.loads(await resp.read())
                 html = j.get("html", "") if isinstance(j, dict) else ""
 
                 if not html or not html.strip():
@@ -229,47 +242,66 @@ async def fetch_page(
     return page, [], True   # keep going on transient errors
 
 
-async def scrape_all() -> list[dict]:
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
-    timeout   = aiohttp.ClientTimeout(total=60)
-    sem       = asyncio.Semaphore(CONCURRENCY)
+async def scrape_all(
+    out: asyncio.Queue, session: aiohttp.ClientSession | None = None
+) -> None:
+    """
+    Scrape every page, putting (page, products) on out as each one lands.
+    A runner can pass its own session to share it with other sites;
+    otherwise one is created here.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if session is None:
+            connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=True)
+            timeout = aiohttp.ClientTimeout(total=60)
+            session = await stack.enter_async_context(
+                aiohttp.ClientSession(connector=connector, timeout=timeout)
+            )
+        await _scrape(session, out)
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        # Page 1 — bootstrap (must run first for cookies + CSRF)
-        first_products, csrf = await bootstrap(session)
-        all_products = list(first_products)
 
-        # Pages 2+ — fetch in rolling batches; stop when any batch item is empty
-        page = 2
-        while page <= MAX_PAGE:
-            batch_pages = list(range(page, page + CONCURRENCY))
-            tasks = [fetch_page(session, p, csrf, sem) for p in batch_pages]
-            results = await asyncio.gather(*tasks)
+async def _scrape(session: aiohttp.ClientSession, out: asyncio.Queue) -> None:
+    sem = asyncio.Semaphore(CONCURRENCY)
 
-            done = False
-            for p, products, has_more in sorted(results, key=lambda r: r[0]):
-                all_products.extend(products)
-                if not has_more:
-                    done = True
+    # Page 1 — bootstrap (must run first for cookies + CSRF)
+    first_products, csrf = await bootstrap(session)
+    post_headers = {**_POST_HEADERS, "X-CSRF-TOKEN": csrf}
+    out.put_nowait((1, first_products))
 
-            page += CONCURRENCY
-            if done:
-                break
+    # Pages 2+ — fetch in rolling batches; stop when any batch item is empty
+    page = 2
+    while page <= MAX_PAGE:
+        batch_pages = list(range(page, page + CONCURRENCY))
+        tasks = [fetch_page(session, p, post_headers, sem) for p in batch_pages]
 
-    return all_products
+        done = False
+        for fut in asyncio.as_completed(tasks):
+            p, products, has_more = await fut
+            out.put_nowait((p, products))
+            if not has_more:
+                done = True
+
+        page += CONCURRENCY
+        if done:
+            break
 
 
 # ---------------------------------------------------------------------------
-# CSV writer
+# Streaming CSV writer
 # ---------------------------------------------------------------------------
 
-def save_csv(products: list[dict], path: Path) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=FIELDNAMES, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(products)
-    print(f"\nSaved {len(products)} rows → {path}")
+async def scrape_to_csv(
+    path: Path,
+    session: aiohttp.ClientSession | None = None,
+    pool: ProcessPoolExecutor | None = None,
+) -> int:
+    """
+    Scrape into path through the shared streaming writer (see common).
+    pool is accepted for the runner's sake; pages are parsed inline.
+    """
+    return await common.scrape_to_csv(
+        path, lambda out: scrape_all(out, session), FIELDNAMES
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -278,23 +310,13 @@ def save_csv(products: list[dict], path: Path) -> None:
 
 def main() -> None:
     print(f"Scraping {LISTING_URL} …\n")
-    products = asyncio.run(scrape_all())
+    rows = asyncio.run(scrape_to_csv(OUTPUT_CSV))
 
-    if not products:
+    if not rows:
         print("No products scraped.", file=sys.stderr)
         sys.exit(1)
 
-    # Deduplicate by product_id (fallback: url)
-    seen: set[str] = set()
-    unique: list[dict] = []
-    for p in products:
-        key = p.get("product_id") or p.get("url") or p.get("name")
-        if key and key not in seen:
-            seen.add(key)
-            unique.append(p)
-
-    print(f"\nTotal unique products: {len(unique)}")
-    save_csv(unique, OUTPUT_CSV)
+    print(f"\nSaved {rows} unique rows → {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":